@@ -3,32 +3,34 @@ api/documents.py
 List and delete indexed documents.
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from app.services.vector_service import VectorService
+from fastapi import APIRouter, Depends, HTTPException
+from app.services.vector_service import VectorService, get_vector_service
 from app.models.schemas import DocumentListResponse, DocumentDeleteResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-vector_service = VectorService()
-
 @router.get("/documents", response_model=DocumentListResponse)
-async def list_documents():
+async def list_documents(vector_service: VectorService = Depends(get_vector_service)):
     try:
-        docs = vector_service.list_documents()
+        docs = await asyncio.to_thread(vector_service.list_documents)
         return DocumentListResponse(documents=docs)
     except Exception as e:
         logger.exception("Error listing documents.")
         raise HTTPException(status_code=500, detail=f"Error listing documents: {e}")
 
 @router.delete("/documents/{doc_id}", response_model=DocumentDeleteResponse)
-async def delete_document(doc_id: str):
+async def delete_document(doc_id: str, vector_service: VectorService = Depends(get_vector_service)):
     try:
-        success = vector_service.delete_document(doc_id)
+        # Deletes may rebuild the index (always for HNSW); keep the event loop free meanwhile
+        success = await asyncio.to_thread(vector_service.delete_document, doc_id)
         if not success:
             raise HTTPException(status_code=404, detail=f"Document with id '{doc_id}' not found.")
         return DocumentDeleteResponse(message=f"Document {doc_id} deleted successfully.")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error deleting document.")
         raise HTTPException(status_code=500, detail=f"Error deleting document: {e}")
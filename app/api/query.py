@@ -3,23 +3,26 @@ api/query.py
 Handles question answering from indexed documents.
 """
 
+import asyncio
 import logging
-from fastapi import APIRouter, HTTPException, Query
-from app.services.vector_service import VectorService
-from app.services.llm_service import generate_answer
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.services.vector_service import VectorService, get_vector_service
+from app.services.query_batcher import QueryBatcher, get_query_batcher
+from app.services.llm_service import generate_answer, LLM_ERROR_MESSAGE
+from app.services.rerank_service import rerank
+from app.services import cache
 from app.models.schemas import QueryResponse, SearchResult
-from app.core.config import TOP_K
+from app.core.config import TOP_K, RERANKER_ENABLED, RERANK_OVERSAMPLE
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Initialize FAISS vector service
-vector_service = VectorService()
-
 @router.post("/query", response_model=QueryResponse)
 async def query_documents(
     question: str = Query(..., description="Question to ask the indexed documents."),
-    top_k: int = Query(TOP_K, description="Number of top chunks to retrieve for context.")
+    top_k: int = Query(TOP_K, description="Number of top chunks to retrieve for context."),
+    vector_service: VectorService = Depends(get_vector_service),
+    batcher: QueryBatcher = Depends(get_query_batcher),
 ):
     """
     Ask a question against the indexed documents.
@@ -27,7 +30,7 @@ async def query_documents(
     Steps:
     1. Validate FAISS index existence.
     2. Embed the question (OpenAI → Ollama fallback).
-    3. Retrieve top chunks from FAISS.
+    3. Retrieve top chunks from FAISS (oversampled + reranked if enabled).
     4. Use Ollama to generate a contextual answer.
     """
     try:
@@ -37,34 +40,62 @@ async def query_documents(
         if not vector_service.index or vector_service.index.ntotal == 0:
             raise HTTPException(status_code=400, detail="No indexed documents available. Please upload a document first.")
 
-        # 2️⃣ Retrieve top results using internal embedding generation
-        results = vector_service.search(question, top_k=top_k)
+        # Serve repeated questions from cache (the generation changes whenever the index does)
+        generation = vector_service.generation
+        cached = await cache.get_response(question, top_k, generation)
+        if cached is not None:
+            logger.info("⚡ Returning cached response for query.")
+            return cached
+
+        # 2️⃣ Embed the question; near-duplicates of cached questions skip search and LLM
+        query_emb = await asyncio.to_thread(vector_service.embed_query, question)
+        cached = await cache.get_similar_response(question, query_emb, top_k, generation)
+        if cached is not None:
+            return cached
+
+        # Search alongside other in-flight queries
+        candidate_k = top_k * RERANK_OVERSAMPLE if RERANKER_ENABLED else top_k
+        results = await batcher.submit(query_emb, candidate_k)
+
+        # Optional: reorder candidates with the cross-encoder (in a worker thread) and keep top_k
+        if RERANKER_ENABLED:
+            results = await asyncio.to_thread(rerank, question, results, top_k)
 
         if not results:
             logger.warning("⚠️ No relevant chunks found for query.")
-            return QueryResponse(
+            response = QueryResponse.model_construct(
                 query=question,
                 answer="No relevant information found in the indexed documents.",
                 retrieved_chunks=0,
                 results=[]
             )
+            await cache.put_response(question, top_k, generation, response, query_emb)
+            return response
 
         # 3️⃣ Collect context chunks for LLM
         context_chunks = [r["text"] for r in results if r.get("text")]
 
-        # 4️⃣ Generate final answer using Ollama
-        answer = generate_answer(context_chunks, question)
+        # 4️⃣ Generate final answer using Ollama (reused when the same chunks answered this before)
+        chunk_keys = [(r.get("doc_id"), r.get("chunk_id")) for r in results]
+        answer = await cache.get_answer(question, chunk_keys)
+        if answer is None:
+            answer = await generate_answer(context_chunks, question)
+            if answer != LLM_ERROR_MESSAGE:
+                await cache.put_answer(question, chunk_keys, answer)
 
-        # 5️⃣ Structure response
-        search_results = [SearchResult(**r) for r in results]
+        # 5️⃣ Structure response (results are built internally, so skip re-validation)
+        search_results = [SearchResult.model_construct(**r) for r in results]
 
         logger.info(f"✅ Query processed successfully. Retrieved {len(context_chunks)} chunks.")
-        return QueryResponse(
+        response = QueryResponse.model_construct(
             query=question,
             answer=answer,
             retrieved_chunks=len(context_chunks),
             results=search_results
         )
+        if answer != LLM_ERROR_MESSAGE:
+            await cache.put_response(question, top_k, generation, response, query_emb)
+        return response
 
     except HTTPException:
         raise
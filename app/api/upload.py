@@ -8,23 +8,62 @@ Handles document uploads:
 """
 
 import os
+import asyncio
 import tempfile
 import logging
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import aiofiles
+import numpy as np
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
 from app.services.file_readers import read_file
 from app.services.docs_service import process_document
-from app.services.vector_service import VectorService
+from app.services.vector_service import VectorService, get_vector_service
+from app.services.uring_io import get_engine as get_uring_engine
 from app.models.schemas import UploadResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-# Initialize FAISS vector service
-vector_service = VectorService()
+UPLOAD_CHUNK_SIZE = 1 << 20  # Stream uploads to disk 1 MB at a time
+UPLOAD_MAX_INFLIGHT = 8      # io_uring writes queued before waiting for completions
+
+
+async def save_upload(file: UploadFile, path: str):
+    """
+    Stream an uploaded file to `path` without buffering it fully in memory.
+    Uses batched io_uring writes on Linux, otherwise aiofiles.
+    """
+    engine = get_uring_engine()
+    if engine is None:
+        async with aiofiles.open(path, "wb") as f:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+        return
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    pending = []  # Engine futures of queued writes
+    try:
+        offset = 0
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            pending.append(engine.submit_write(fd, chunk, offset))
+            offset += len(chunk)
+            if len(pending) >= UPLOAD_MAX_INFLIGHT:
+                await asyncio.gather(*map(asyncio.wrap_future, pending))
+                pending.clear()
+        await asyncio.gather(*map(asyncio.wrap_future, pending))
+        pending.clear()
+    finally:
+        # On errors or cancellation, let writes already in the ring finish (not-yet-started
+        # ones are skipped) so none of them lands on a closed or reused fd
+        if pending:
+            await asyncio.gather(*map(asyncio.wrap_future, pending), return_exceptions=True)
+        os.close(fd)
 
 @router.post("/upload", response_model=UploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+async def upload_document(
+    file: UploadFile = File(...),
+    vector_service: VectorService = Depends(get_vector_service),
+):
     """
     Upload a document, extract text, generate embeddings, and store them in FAISS.
     """
@@ -38,43 +77,30 @@ async def upload_document(file: UploadFile = File(...)):
     try:
         with tempfile.TemporaryDirectory() as tmpdir:
             temp_path = os.path.join(tmpdir, filename)
-            with open(temp_path, "wb") as f:
-                contents = await file.read()
-                f.write(contents)
+            await save_upload(file, temp_path)
 
             # Step 1: Extract text
-            text = read_file(temp_path)
+            text = await asyncio.to_thread(read_file, temp_path)
             if not text.strip():
                 raise HTTPException(status_code=400, detail="No readable text found in the document.")
 
             # Step 2: Process (chunk + embed)
-            result = process_document(text)
+            result = await process_document(text)
             chunks = result["chunks"]
-            embeddings = result["embeddings"]
+            emb_arr = np.asarray(result["embeddings"], dtype=np.float32)  # one (N, dim) block
 
-            # Step 3: Prepare metadata
+            # Step 3: Store in FAISS (chunk metadata is derived from the parallel chunk list)
             doc_id = str(uuid.uuid4())[:8]  # short unique ID
-            metadatas = [
-                {
-                    "doc_id": doc_id,
-                    "source": filename,
-                    "chunk_id": i,
-                    "text": chunk,
-                    "embedding": emb
-                }
-                for i, (chunk, emb) in enumerate(zip(chunks, embeddings))
-            ]
-
-            # Step 4: Store in FAISS
-            vector_service.add_embeddings(embeddings, metadatas)
+            # HNSW inserts and IVF-PQ / int8 training are CPU-bound; run them in a worker thread
+            await asyncio.to_thread(vector_service.add_embeddings, emb_arr, chunks, doc_id, filename)
             logger.info(f"✅ Stored document '{filename}' in FAISS with {len(chunks)} chunks.")
 
-            # Step 5: Return response
+            # Step 4: Return response
             return UploadResponse(
                 filename=filename,
                 extension=ext,
                 total_chunks=len(chunks),
-                embedding_dimension=len(embeddings[0]) if embeddings else 0,
+                embedding_dimension=emb_arr.shape[1] if emb_arr.ndim == 2 else 0,
                 message="File processed, embedded, and stored successfully."
             )
 
@@ -7,6 +7,7 @@ a single source of truth for all configurable parameters.
 """
 
 import os
+import re
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -27,12 +28,17 @@ if not OPENAI_API_KEY:
     raise ValueError("❌ OPENAI_API_KEY is missing. Please set it in your .env file.")
 
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 2048))  # Max inputs per OpenAI embeddings request (API limit)
+EMBEDDING_BATCH_MAX_TOKENS = int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", 290_000))  # Tokens packed per request (API limit 300k)
+EMBEDDING_MAX_INPUT_TOKENS = 8191  # Per-input limit of OpenAI embedding models; longer inputs are truncated
 
 # -------------------------------
 # LLM Config (Ollama)
 # -------------------------------
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")  # Default model pulled via `ollama pull llama3`
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")  # How long Ollama keeps models loaded after a call
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"  # Load the LLM at startup
 
 # -------------------------------
 # FAISS / Storage Config
@@ -40,16 +46,97 @@ OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")  # Default model pulled via `
 DATA_DIR = Path(os.getenv("DATA_DIR", BASE_DIR / "data" / "index"))
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-FAISS_INDEX_PATH = DATA_DIR / "faiss.index"
-METADATA_PATH = DATA_DIR / "metadata.json"
+# Index files are keyed by embedding model so switching models never mixes vector spaces.
+# A sidecar JSON records the model + dimension the index was built with.
+# Chunk metadata is stored in SQLite (one row per vector); raw vectors as headerless float32 rows
+# (row = vector id) that inserts append to and searches memory-map, so they are not held on the heap.
+_MODEL_KEY = re.sub(r"[^A-Za-z0-9._-]", "_", EMBEDDING_MODEL)
+FAISS_INDEX_PATH = DATA_DIR / f"faiss_{_MODEL_KEY}.index"
+METADATA_PATH = DATA_DIR / f"metadata_{_MODEL_KEY}.db"
+EMBEDDINGS_PATH = DATA_DIR / f"embeddings_{_MODEL_KEY}.f32"
+INDEX_META_PATH = DATA_DIR / f"faiss_{_MODEL_KEY}.meta.json"
+
+# Files written by earlier versions (migrated on first load)
+LEGACY_FAISS_INDEX_PATH = DATA_DIR / "faiss.index"
+LEGACY_METADATA_PATH = DATA_DIR / "metadata.json"
+
+# Index type (all use inner product on L2-normalized vectors, i.e. cosine similarity):
+#   "hnsw"    - approximate graph search, sub-linear query time (default)
+#   "flat"    - exact brute force
+#   "ivfpq"   - inverted lists + product quantization (~16-64x smaller); exact flat until trainable
+#   "sq_fp16" - brute force over fp16 vectors (half the memory, negligible recall loss)
+#   "sq_int8" - brute force over int8 vectors (a quarter of the memory, small recall loss before rescoring)
+#   "auto"    - exact flat below AUTO_IVF_MIN_VECTORS, then IVF-PQ with nlist ~ sqrt(N)
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "hnsw").lower()
+HNSW_M = int(os.getenv("HNSW_M", 32))                            # Graph neighbors per node
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 200))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 64))
+IVF_NLIST = int(os.getenv("IVF_NLIST", 1024))                    # Inverted lists (coarse centroids)
+AUTO_IVF_MIN_VECTORS = int(os.getenv("AUTO_IVF_MIN_VECTORS", 10_000))  # "auto": switch to IVF-PQ at this size
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))                    # Lists scanned per query
+IVF_TRAIN_SIZE = int(os.getenv("IVF_TRAIN_SIZE", 50_000))        # Max vectors used for training
+PQ_M = int(os.getenv("PQ_M", 64))                                # Sub-quantizers per vector
+PQ_NBITS = int(os.getenv("PQ_NBITS", 8))                         # Bits per sub-quantizer code
+# Quantized-index candidates rescored exactly per result (1 = off). Rescoring reads the candidates'
+# float32 rows from the memory-mapped vector file: top_k x RESCORE_OVERSAMPLE rows (4 x dim bytes each)
+# per query, cached by the OS page cache (reclaimable, up to the file's 4 x N x dim bytes) rather than
+# held on the heap. The file is kept either way, since rebuilds need the exact vectors.
+RESCORE_OVERSAMPLE = int(os.getenv("RESCORE_OVERSAMPLE", 4))
+
+# Serve searches from GPU when faiss-gpu and a CUDA device are available
+FAISS_USE_GPU = os.getenv("FAISS_USE_GPU", "true").lower() == "true"
+FAISS_GPU_FP16 = os.getenv("FAISS_GPU_FP16", "false").lower() == "true"  # Store GPU vectors as fp16 (half the VRAM)
+
+# CPU search threads: split the cores between Uvicorn worker processes so
+# workers x FAISS_OMP_THREADS does not oversubscribe the machine
+UVICORN_WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))  # Same variable `uvicorn --workers` reads
+FAISS_OMP_THREADS = int(os.getenv("FAISS_OMP_THREADS", max(1, (os.cpu_count() or 1) // UVICORN_WORKERS)))
+FAISS_HUGEPAGES = os.getenv("FAISS_HUGEPAGES", "true").lower() == "true"  # madvise(MADV_HUGEPAGE) on in-memory vector matrices
+
+# Debounced persistence: write the index once this many vectors changed, or this long after a change
+PERSIST_MIN_VECTORS = int(os.getenv("PERSIST_MIN_VECTORS", 1024))
+PERSIST_INTERVAL_SECONDS = float(os.getenv("PERSIST_INTERVAL_SECONDS", 30))
+
+# Deletes remove vectors in place; rebuild (and renumber ids) once live vectors fall below this
+# fraction of allocated ids. HNSW indexes cannot remove in place and always rebuild.
+INDEX_COMPACT_MIN_LIVE = float(os.getenv("INDEX_COMPACT_MIN_LIVE", 0.1))
+
+# On-disk cache of chunk embeddings keyed by (model, sha256(text))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = DATA_DIR / "embedding_cache.db"
 
 
 # -------------------------------
 # Retrieval / Chunking Config
 # -------------------------------
 TOP_K = int(os.getenv("TOP_K", 4))              # Number of chunks to retrieve per query
+QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", 16))            # Concurrent queries per FAISS call
+QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", 5))     # Wait to fill a query batch
 CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000)) # Default chunk size for text splitting
 CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+CHUNK_PROCESS_POOL_MIN_CHARS = int(os.getenv("CHUNK_PROCESS_POOL_MIN_CHARS", 2_000_000))  # Split larger texts in a worker process
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 3))  # Extract larger PDFs across worker processes
+PDFIUM_PARALLEL_MIN_PAGES = int(os.getenv("PDFIUM_PARALLEL_MIN_PAGES", 200))  # Same, when pypdfium2 is installed
+
+# Write uploads through io_uring on Linux (falls back to aiofiles when unavailable)
+IO_URING_ENABLED = os.getenv("IO_URING_ENABLED", "true").lower() == "true"
+
+
+# -------------------------------
+# Reranker Config (Cross-Encoder)
+# -------------------------------
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "BAAI/bge-reranker-v2-m3")
+RERANK_OVERSAMPLE = int(os.getenv("RERANK_OVERSAMPLE", 6))  # FAISS candidates fetched per final chunk
+
+# -------------------------------
+# Query Cache Config
+# -------------------------------
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 4096))  # In-process LRU of query vectors
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))   # Cached /query responses
+QUERY_CACHE_TTL = int(os.getenv("QUERY_CACHE_TTL", 600))      # Seconds before a cached response expires
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))  # Cosine for a near-duplicate question hit
+REDIS_URL = os.getenv("REDIS_URL", "")  # e.g. redis://localhost:6379/0; empty = in-process cache only
 
 
 # -------------------------------
@@ -69,4 +156,5 @@ def print_config_summary():
     print(f"Ollama model: {OLLAMA_MODEL} @ {OLLAMA_BASE_URL}")
     print(f"FAISS directory: {DATA_DIR}")
     print(f"Chunk size / overlap: {CHUNK_SIZE}/{CHUNK_OVERLAP}")
-    print(f"Retrieval Top-K: {TOP_K}\n")
\ No newline at end of file
+    print(f"Retrieval Top-K: {TOP_K}")
+    print(f"Reranker: {RERANKER_MODEL if RERANKER_ENABLED else 'disabled'}\n")
\ No newline at end of file
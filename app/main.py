@@ -5,21 +5,38 @@ Entry point for the RAG-based Document QA FastAPI application.
 Integrates OpenAI embeddings (for retrieval) and Ollama (for local LLM generation).
 """
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from app.core.logging import configure_logging
-from app.core.config import APP_NAME, ENVIRONMENT
+from app.core.config import APP_NAME, ENVIRONMENT, OLLAMA_WARMUP
 from app.api import upload, query, documents
+from app.services.vector_service import get_vector_service
+from app.services.llm_service import warm_up as warm_up_llm
 
 # Initialize logging
 configure_logging()
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the LLM in the background while the shared FAISS index loads
+    if OLLAMA_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, warm_up_llm)
+    vector_service = await asyncio.to_thread(get_vector_service)
+    yield
+    # Write any changes still waiting for the debounced flush
+    await asyncio.to_thread(vector_service.flush)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=APP_NAME,
     description="RAG-based Document QA System using OpenAI Embeddings + Ollama LLM",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Register routers
@@ -0,0 +1,168 @@
+"""
+services/cache.py
+
+Two-tier cache for /query responses and generated answers.
+L1: in-process TTL cache. L2: Redis (optional) when REDIS_URL is set, so
+workers share hits and they survive restarts.
+Near-duplicate questions are matched by cosine similarity of their query
+embeddings against a small IndexFlatIP of recently cached questions.
+"""
+
+import hashlib
+import logging
+from typing import List, Optional, Sequence, Tuple
+import faiss
+import numpy as np
+from cachetools import TTLCache
+from app.core.config import (
+    QUERY_CACHE_SIZE,
+    QUERY_CACHE_TTL,
+    REDIS_URL,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from app.models.schemas import QueryResponse
+
+logger = logging.getLogger(__name__)
+
+# L1: key → QueryResponse / answer string
+_l1 = TTLCache(maxsize=QUERY_CACHE_SIZE, ttl=QUERY_CACHE_TTL)
+
+# L2: Redis (optional dependency); the asyncio client keeps round trips off the event loop
+_redis = None
+if REDIS_URL:
+    import redis.asyncio as redis
+
+    _redis = redis.Redis.from_url(REDIS_URL, socket_timeout=0.05)
+    logger.info("✅ Redis query cache enabled.")
+
+# Semantic tier: row i of _sem_index is the query embedding of _sem_entries[i] = (key, top_k, generation)
+_sem_index: Optional[faiss.IndexFlatIP] = None
+_sem_entries: List[Tuple[str, int, str]] = []
+_SEM_NEIGHBORS = 4
+_SEM_LOW_WATER = QUERY_CACHE_SIZE // 2  # Entries kept by a prune
+
+
+def _key(kind: str, *parts) -> str:
+    digest = hashlib.blake2b("\x00".join(map(str, parts)).encode("utf-8"), digest_size=16).hexdigest()
+    return f"{kind}:{digest}"
+
+
+async def _redis_get(key: str) -> Optional[bytes]:
+    if _redis is None:
+        return None
+    try:
+        return await _redis.get(key)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis cache read failed ({e}).")
+        return None
+
+
+async def _redis_set(key: str, value: str):
+    if _redis is None:
+        return
+    try:
+        await _redis.setex(key, QUERY_CACHE_TTL, value)
+    except Exception as e:
+        logger.warning(f"⚠️ Redis cache write failed ({e}).")
+
+
+async def _get_response(key: str) -> Optional[QueryResponse]:
+    response = _l1.get(key)
+    if response is None:
+        raw = await _redis_get(key)
+        if raw is not None:
+            response = _l1[key] = QueryResponse.model_validate_json(raw)
+    return response
+
+
+# ----------------------------
+# Responses
+# ----------------------------
+async def get_response(question: str, top_k: int, generation: str) -> Optional[QueryResponse]:
+    """Exact match on the normalized question (the index generation changes whenever the index does)."""
+    return await _get_response(_key("sem", question.strip().lower(), top_k, generation))
+
+
+async def get_similar_response(
+    question: str, query_emb: np.ndarray, top_k: int, generation: str
+) -> Optional[QueryResponse]:
+    """
+    Near match: a cached question whose (normalized) embedding has cosine >= SEMANTIC_CACHE_THRESHOLD.
+    The cached response is returned with `query` set to this question.
+    """
+    if _sem_index is None or _sem_index.ntotal == 0 or query_emb.shape[1] != _sem_index.d:
+        return None
+    scores, rows = _sem_index.search(query_emb, min(_SEM_NEIGHBORS, _sem_index.ntotal))
+    for score, row in zip(scores[0], rows[0]):
+        if row < 0 or score < SEMANTIC_CACHE_THRESHOLD:
+            break
+        key, entry_top_k, entry_generation = _sem_entries[row]
+        if entry_top_k == top_k and entry_generation == generation:
+            response = await _get_response(key)
+            if response is not None:
+                logger.info(f"⚡ Semantic cache hit (cosine={score:.3f}).")
+                return response.model_copy(update={"query": question})
+    return None
+
+
+async def put_response(
+    question: str,
+    top_k: int,
+    generation: str,
+    response: QueryResponse,
+    query_emb: Optional[np.ndarray] = None,
+):
+    """Cache a response by exact question and, given its embedding, for near matches."""
+    global _sem_index
+    key = _key("sem", question.strip().lower(), top_k, generation)
+    _l1[key] = response
+    await _redis_set(key, response.model_dump_json())
+
+    if query_emb is None:
+        return
+    if _sem_index is None or _sem_index.d != query_emb.shape[1]:
+        _sem_index = faiss.IndexFlatIP(query_emb.shape[1])
+        _sem_entries.clear()
+    elif _sem_index.ntotal >= QUERY_CACHE_SIZE:
+        _prune_semantic_index()
+    _sem_index.add(query_emb)
+    _sem_entries.append((key, top_k, generation))
+
+
+def _prune_semantic_index():
+    """
+    Drop embeddings whose responses left L1, keeping at most the newest half of
+    capacity so at least QUERY_CACHE_SIZE / 2 puts pass before the next rebuild.
+    """
+    global _sem_index, _sem_entries
+    keep = [i for i, (key, _, _) in enumerate(_sem_entries) if key in _l1]
+    keep = keep[max(0, len(keep) - _SEM_LOW_WATER):]
+    vectors = _sem_index.reconstruct_n(0, _sem_index.ntotal)[keep]
+    _sem_index = faiss.IndexFlatIP(_sem_index.d)
+    _sem_index.add(vectors)
+    _sem_entries = [_sem_entries[i] for i in keep]
+
+
+# ----------------------------
+# Answers
+# ----------------------------
+def _answer_key(question: str, chunk_keys: Sequence[Tuple]) -> str:
+    return _key("ans", question.strip().lower(), *chunk_keys)
+
+
+async def get_answer(question: str, chunk_keys: Sequence[Tuple]) -> Optional[str]:
+    """Cached LLM answer for this question over exactly these (doc_id, chunk_id) chunks."""
+    key = _answer_key(question, chunk_keys)
+    answer = _l1.get(key)
+    if answer is None:
+        raw = await _redis_get(key)
+        if raw is not None:
+            answer = _l1[key] = raw.decode("utf-8")
+    return answer
+
+
+async def put_answer(question: str, chunk_keys: Sequence[Tuple], answer: str):
+    """Cache an LLM answer for this question and context."""
+    key = _answer_key(question, chunk_keys)
+    _l1[key] = answer
+    await _redis_set(key, answer)
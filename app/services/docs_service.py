@@ -6,42 +6,46 @@ Handles:
 2. Generating embeddings for chunks using OpenAI embeddings.
 """
 
+import asyncio
 import logging
-from typing import List, Dict
+from typing import List, Dict, Sequence
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.services.embedding_service import get_embeddings
-from app.core.config import CHUNK_SIZE, CHUNK_OVERLAP
+from app.services.embedding_service import get_embeddings, get_embeddings_async
+from app.services.process_pool import get_process_pool
+from app.core.config import CHUNK_SIZE, CHUNK_OVERLAP, CHUNK_PROCESS_POOL_MIN_CHARS
 
 logger = logging.getLogger(__name__)
 
-def chunk_text(text: str) -> List[str]:
+def chunk_text(text: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP) -> List[str]:
     """
     Splits the input text into overlapping chunks.
 
     Args:
         text (str): Full text extracted from document.
+        chunk_size (int): Maximum characters per chunk.
+        chunk_overlap (int): Characters shared by consecutive chunks.
     Returns:
         List[str]: List of text chunks.
     """
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         separators=["\n\n", "\n", " ", ""]
     )
 
     chunks = splitter.split_text(text)
-    logger.info(f"✅ Text split into {len(chunks)} chunks (size={CHUNK_SIZE}, overlap={CHUNK_OVERLAP})")
+    logger.info(f"✅ Text split into {len(chunks)} chunks (size={chunk_size}, overlap={chunk_overlap})")
     return chunks
 
 
-def embed_chunks(chunks: List[str]) -> List[List[float]]:
+def embed_chunks(chunks: List[str]) -> List[Sequence[float]]:
     """
     Generates embeddings for each text chunk using OpenAI embeddings.
 
     Args:
         chunks (List[str]): List of text chunks.
     Returns:
-        List[List[float]]: Corresponding list of embedding vectors.
+        List[Sequence[float]]: Corresponding list of embedding vectors.
     """
     if not chunks:
         raise ValueError("No text chunks provided for embedding.")
@@ -52,10 +56,39 @@ def embed_chunks(chunks: List[str]) -> List[List[float]]:
     return embeddings
 
 
-def process_document(text: str) -> Dict:
+async def embed_chunks_async(chunks: List[str]) -> List[Sequence[float]]:
+    """
+    Async variant of `embed_chunks`; batches are embedded concurrently.
+
+    Args:
+        chunks (List[str]): List of text chunks.
+    Returns:
+        List[Sequence[float]]: Corresponding list of embedding vectors.
+    """
+    if not chunks:
+        raise ValueError("No text chunks provided for embedding.")
+
+    logger.info(f"🔢 Generating embeddings for {len(chunks)} chunks...")
+    embeddings = await get_embeddings_async(chunks)
+    logger.info(f"✅ Generated {len(embeddings)} embeddings successfully.")
+    return embeddings
+
+
+async def chunk_text_async(text: str) -> List[str]:
+    """
+    Runs `chunk_text` off the event loop: in a worker thread for typical
+    documents, or in a worker process for very large texts.
+    """
+    if len(text) >= CHUNK_PROCESS_POOL_MIN_CHARS:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_process_pool(), chunk_text, text)
+    return await asyncio.to_thread(chunk_text, text)
+
+
+async def process_document(text: str) -> Dict:
     """
     Full document processing pipeline:
-      1. Chunk text
+      1. Chunk text (off the event loop)
       2. Embed chunks
 
     Args:
@@ -63,8 +96,8 @@ def process_document(text: str) -> Dict:
     Returns:
         Dict: Contains chunks and their embeddings.
     """
-    chunks = chunk_text(text)
-    embeddings = embed_chunks(chunks)
+    chunks = await chunk_text_async(text)
+    embeddings = await embed_chunks_async(chunks)
 
     result = {
         "total_chunks": len(chunks),
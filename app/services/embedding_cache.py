@@ -0,0 +1,78 @@
+"""
+services/embedding_cache.py
+
+Persistent cache of text embeddings stored in SQLite.
+Entries are keyed by sha256(EMBEDDING_MODEL + text), so re-uploaded or
+overlapping chunks are never sent to the embedding API twice, and
+changing the model naturally misses the old entries.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from app.core.config import EMBEDDING_CACHE_ENABLED, EMBEDDING_CACHE_PATH, EMBEDDING_MODEL
+
+logger = logging.getLogger(__name__)
+
+# SQLite limits the number of bound parameters per statement
+_SELECT_BATCH = 500
+
+_lock = threading.Lock()
+_conn = None
+if EMBEDDING_CACHE_ENABLED:
+    _conn = sqlite3.connect(str(EMBEDDING_CACHE_PATH), check_same_thread=False)
+    _conn.execute("PRAGMA journal_mode=WAL")
+    _conn.execute("CREATE TABLE IF NOT EXISTS emb_cache (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+    _conn.commit()
+
+
+def _key(text: str) -> bytes:
+    """Cache key for a text under the configured embedding model."""
+    return hashlib.sha256(f"{EMBEDDING_MODEL}\x00{text}".encode("utf-8")).digest()
+
+
+def lookup(texts: List[str]) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+    """
+    Fetch cached embeddings for the given texts.
+
+    Args:
+        texts (List[str]): Texts to look up.
+    Returns:
+        Tuple: (float32 vectors in input order with None for misses, indices of the misses).
+    """
+    if _conn is None:
+        return [None] * len(texts), list(range(len(texts)))
+
+    keys = [_key(t) for t in texts]
+    found = {}
+    with _lock:
+        for start in range(0, len(keys), _SELECT_BATCH):
+            batch = keys[start:start + _SELECT_BATCH]
+            placeholders = ",".join("?" * len(batch))
+            rows = _conn.execute(
+                f"SELECT key, vector FROM emb_cache WHERE key IN ({placeholders})", batch
+            ).fetchall()
+            found.update(rows)
+
+    # Read-only float32 views of the blobs; callers stack them into one matrix
+    vectors = [np.frombuffer(found[k], dtype=np.float32) if k in found else None for k in keys]
+    misses = [i for i, v in enumerate(vectors) if v is None]
+    logger.info(f"🗃️ Embedding cache: {len(texts) - len(misses)} hits, {len(misses)} misses")
+    return vectors, misses
+
+
+def store(texts: List[str], vectors: Sequence[Sequence[float]]) -> None:
+    """Persist freshly generated embeddings for the given texts."""
+    if _conn is None or not texts:
+        return
+
+    rows = [
+        (_key(t), np.asarray(v, dtype=np.float32).tobytes())
+        for t, v in zip(texts, vectors)
+    ]
+    with _lock:
+        _conn.executemany("INSERT OR REPLACE INTO emb_cache (key, vector) VALUES (?, ?)", rows)
+        _conn.commit()
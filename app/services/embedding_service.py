@@ -2,67 +2,220 @@
 services/embedding_service.py
 
 Generates embeddings for texts.
-Primary: OpenAI API
+Primary: OpenAI API (pre-tokenized, token-packed concurrent requests, cached on disk)
 Fallback: Ollama local embedding model (mxbai-embed-large)
 """
 
+import asyncio
 import logging
-from typing import List
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+import httpx
 import numpy as np
-from openai import OpenAI, RateLimitError, APIError
+from openai import OpenAI, AsyncOpenAI, RateLimitError, APIError
 from ollama import Client as OllamaClient
-from app.core.config import OPENAI_API_KEY, EMBEDDING_MODEL, OLLAMA_BASE_URL
+from app.services import embedding_cache
+from app.core.config import (
+    OPENAI_API_KEY,
+    EMBEDDING_MODEL,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_MAX_TOKENS,
+    EMBEDDING_MAX_INPUT_TOKENS,
+    OLLAMA_BASE_URL,
+    OLLAMA_KEEP_ALIVE,
+    QUERY_EMBEDDING_CACHE_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 
+OLLAMA_EMBEDDING_MODEL = "mxbai-embed-large"
+OLLAMA_MAX_WORKERS = 8
+
 # Initialize both clients
 openai_client = OpenAI(api_key=OPENAI_API_KEY)
-ollama_client = OllamaClient(host=OLLAMA_BASE_URL)
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
+# Keep-alive pool sized for the parallel fallback so workers reuse connections
+ollama_client = OllamaClient(
+    host=OLLAMA_BASE_URL,
+    limits=httpx.Limits(max_keepalive_connections=2 * OLLAMA_MAX_WORKERS),
+)
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tokenizer for EMBEDDING_MODEL once; None if tiktoken is unavailable."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(EMBEDDING_MODEL)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"⚠️ tiktoken unavailable ({e}). Sending raw text with estimated token counts.")
+        return None
+
+
+def _tokenize(texts: List[str]) -> Tuple[List[Union[str, List[int]]], List[int]]:
+    """
+    Tokenize texts client-side so OpenAI receives token arrays.
+
+    Returns:
+        Tuple: (request inputs, token count per input). Inputs are raw strings
+        with a ~4 chars/token estimate when no tokenizer could be loaded.
+    """
+    enc = _get_encoding()
+    if enc is None:
+        return list(texts), [len(t) // 4 + 1 for t in texts]
+    tokens = [t[:EMBEDDING_MAX_INPUT_TOKENS] for t in enc.encode_ordinary_batch(texts)]
+    return tokens, [len(t) for t in tokens]
+
+
+def _token_batches(inputs: List, counts: List[int]) -> Iterator[List]:
+    """Greedily pack inputs into requests of at most EMBEDDING_BATCH_MAX_TOKENS tokens."""
+    batch, batch_tokens = [], 0
+    for item, n in zip(inputs, counts):
+        if batch and (batch_tokens + n > EMBEDDING_BATCH_MAX_TOKENS or len(batch) >= EMBEDDING_BATCH_SIZE):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += n
+    if batch:
+        yield batch
 
 
 def _openai_embeddings(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings using OpenAI."""
+    """Generate embeddings using OpenAI (one request per token-packed batch)."""
     logger.info(f"🔹 Generating embeddings via OpenAI model: {EMBEDDING_MODEL}")
-    response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=texts)
-    return [d.embedding for d in response.data]
+    vectors = []
+    for batch in _token_batches(*_tokenize(texts)):
+        response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=batch)
+        vectors.extend(d.embedding for d in response.data)
+    return vectors
+
+
+async def _openai_embeddings_async(texts: List[str]) -> List[List[float]]:
+    """Generate embeddings using OpenAI, issuing all token-packed batches concurrently."""
+    # Tokenizing a whole document is CPU-bound; keep it off the event loop
+    inputs, counts = await asyncio.to_thread(_tokenize, texts)
+    batches = list(_token_batches(inputs, counts))
+    logger.info(f"🔹 Generating embeddings via OpenAI model: {EMBEDDING_MODEL} ({len(batches)} batches)")
+    responses = await asyncio.gather(
+        *[async_openai_client.embeddings.create(model=EMBEDDING_MODEL, input=b) for b in batches]
+    )
+    return [d.embedding for response in responses for d in response.data]
+
+
+def _ollama_embed_one(text: str) -> List[float]:
+    """Embed a single text with the local Ollama model."""
+    return ollama_client.embeddings(
+        model=OLLAMA_EMBEDDING_MODEL, prompt=text, keep_alive=OLLAMA_KEEP_ALIVE
+    )["embedding"]
 
 
 def _ollama_embeddings(texts: List[str]) -> List[List[float]]:
-    """Generate embeddings using local Ollama model."""
-    model_name = "mxbai-embed-large"
-    logger.info(f"🔸 Generating embeddings via Ollama model: {model_name}")
-    vectors = []
-    for text in texts:
-        result = ollama_client.embeddings(model=model_name, prompt=text)
-        vectors.append(result["embedding"])
+    """Generate embeddings using local Ollama model (parallel per-text calls)."""
+    logger.info(f"🔸 Generating embeddings via Ollama model: {OLLAMA_EMBEDDING_MODEL}")
+    with ThreadPoolExecutor(max_workers=OLLAMA_MAX_WORKERS) as executor:
+        return list(executor.map(_ollama_embed_one, texts))
+
+
+def _fill_misses(
+    texts: List[str],
+    vectors: List[Optional[np.ndarray]],
+    misses: List[int],
+    miss_texts: List[str],
+    fresh: np.ndarray,
+) -> List[np.ndarray]:
+    """Slot freshly embedded (float32) rows back into input order."""
+    by_text = dict(zip(miss_texts, fresh))
+    for i in misses:
+        vectors[i] = by_text[texts[i]]
     return vectors
 
 
-def get_embeddings(texts: List[str]) -> List[List[float]]:
+def get_embeddings(texts: List[str]) -> List[Sequence[float]]:
     """
     Generate embeddings for a list of texts using OpenAI,
     falling back to Ollama if API quota or network fails.
+    Only cache misses are sent to OpenAI; Ollama results are never cached
+    and re-embed every text so all vectors share one embedding space.
+    OpenAI vectors are returned as float32 rows, ready for one `np.asarray` stack.
     """
+    vectors, misses = embedding_cache.lookup(texts)
+    if not misses:
+        return vectors
+
+    miss_texts = list(dict.fromkeys(texts[i] for i in misses))
     try:
-        return _openai_embeddings(texts)
+        fresh = _openai_embeddings(miss_texts)
     except (RateLimitError, APIError) as e:
         logger.warning(f"⚠️ OpenAI embedding failed ({e}). Switching to local Ollama embeddings...")
         return _ollama_embeddings(texts)
     except Exception as e:
         logger.error(f"❌ Unexpected embedding error: {e}. Using Ollama fallback.")
         return _ollama_embeddings(texts)
+    fresh = np.asarray(fresh, dtype=np.float32)
+    embedding_cache.store(miss_texts, fresh)
+    return _fill_misses(texts, vectors, misses, miss_texts, fresh)
+
+
+async def get_embeddings_async(texts: List[str]) -> List[Sequence[float]]:
+    """
+    Async variant of `get_embeddings` for request handlers.
+    OpenAI batches are sent concurrently; cache I/O and the Ollama fallback run in worker threads.
+    """
+    vectors, misses = await asyncio.to_thread(embedding_cache.lookup, texts)
+    if not misses:
+        return vectors
+
+    miss_texts = list(dict.fromkeys(texts[i] for i in misses))
+    try:
+        fresh = await _openai_embeddings_async(miss_texts)
+    except (RateLimitError, APIError) as e:
+        logger.warning(f"⚠️ OpenAI embedding failed ({e}). Switching to local Ollama embeddings...")
+        return await asyncio.to_thread(_ollama_embeddings, texts)
+    except Exception as e:
+        logger.error(f"❌ Unexpected embedding error: {e}. Using Ollama fallback.")
+        return await asyncio.to_thread(_ollama_embeddings, texts)
+    fresh = np.asarray(fresh, dtype=np.float32)
+    await asyncio.to_thread(embedding_cache.store, miss_texts, fresh)
+    return _fill_misses(texts, vectors, misses, miss_texts, fresh)
+
+
+def _frozen(vector: Sequence[float]) -> np.ndarray:
+    """float32 read-only copy: ~4 bytes per dim in the cache instead of a Python float object each."""
+    arr = np.asarray(vector, dtype=np.float32)
+    arr.flags.writeable = False
+    return arr
+
 
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _openai_query_embedding(text: str) -> np.ndarray:
+    """Embed a query with OpenAI; memoized so repeated questions skip the API call."""
+    inputs, _ = _tokenize([text])
+    response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=inputs)
+    return _frozen(response.data[0].embedding)
 
-def get_single_embedding(text: str) -> List[float]:
-    """Generate an embedding for a single query text."""
+
+@lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)
+def _ollama_query_embedding(text: str) -> np.ndarray:
+    """Embed a query with Ollama; memoized separately so fallback vectors never mix with OpenAI ones."""
+    return _frozen(_ollama_embed_one(text))
+
+
+def get_single_embedding(text: str) -> np.ndarray:
+    """
+    Generate an embedding for a single query text.
+    Results are cached in-process per provider and returned as read-only
+    float32 arrays; copy before modifying (e.g. normalizing in place).
+    """
     try:
-        response = openai_client.embeddings.create(model=EMBEDDING_MODEL, input=[text])
-        return response.data[0].embedding
+        return _openai_query_embedding(text)
     except (RateLimitError, APIError):
         logger.warning("⚠️ OpenAI query embedding failed. Using Ollama fallback...")
-        result = ollama_client.embeddings(model="mxbai-embed-large", prompt=text)
-        return result["embedding"]
+        return _ollama_query_embedding(text)
     except Exception as e:
         logger.error(f"❌ Embedding generation error: {e}")
-        result = ollama_client.embeddings(model="mxbai-embed-large", prompt=text)
-        return result["embedding"]
+        return _ollama_query_embedding(text)
@@ -3,10 +3,28 @@ services/file_readers.py
 
 Handles reading and extracting text from different document types.
 Currently supports: .txt and .pdf
+PDF text comes from PDFium (pypdfium2) when installed, else pure-Python PyPDF2.
+Multi-page PDFs are extracted in parallel, in small contiguous page ranges across worker processes.
 """
 
 import os
+import threading
+from typing import List
 from PyPDF2 import PdfReader
+from app.core.config import PDF_PARALLEL_MIN_PAGES, PDFIUM_PARALLEL_MIN_PAGES
+from app.services.process_pool import get_process_pool
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:  # Optional dependency
+    pdfium = None
+
+# PDFium is not thread-safe; serialize in-process use (each worker process has its own copy)
+_pdfium_lock = threading.Lock()
+
+# Several page ranges per worker so a few slow (image-heavy) pages do not stall one process
+_TASKS_PER_WORKER = 4
+
 
 def read_file(file_path: str) -> str:
     """
@@ -40,11 +58,60 @@ def read_txt(file_path: str) -> str:
         raise ValueError(f"Error reading text file: {e}")
 
 
+def _pdfium_page_text(pdf, index: int) -> str:
+    page = pdf[index]
+    textpage = page.get_textpage()
+    try:
+        return textpage.get_text_range().replace("\r\n", "\n")
+    finally:
+        textpage.close()
+        page.close()
+
+
+def _page_count(file_path: str) -> int:
+    if pdfium is None:
+        return len(PdfReader(file_path).pages)
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+
+def _extract_pages(file_path: str, start: int, end: int) -> List[str]:
+    """Extracts text from pages [start, end) of a PDF (also runs in worker processes)."""
+    if pdfium is None:
+        reader = PdfReader(file_path)
+        return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(file_path)
+        try:
+            return [_pdfium_page_text(pdf, i) for i in range(start, end)]
+        finally:
+            pdf.close()
+
+
+def _extract_pages_parallel(file_path: str, num_pages: int) -> List[str]:
+    """Splits the page range across worker processes and returns pages in order."""
+    workers = os.cpu_count() or 1
+    step = -(-num_pages // (workers * _TASKS_PER_WORKER))  # ceil division
+    starts = range(0, num_pages, step)
+    ends = [min(start + step, num_pages) for start in starts]
+    ranges = get_process_pool().map(_extract_pages, [file_path] * len(starts), starts, ends)
+    return [page for pages in ranges for page in pages]
+
+
 def read_pdf(file_path: str) -> str:
     """Extracts and returns text from all pages of a PDF."""
     try:
-        reader = PdfReader(file_path)
-        text_pages = [page.extract_text() or "" for page in reader.pages]
+        num_pages = _page_count(file_path)
+        # PDFium is fast enough that worker start-up only pays off on long documents
+        min_pages = PDF_PARALLEL_MIN_PAGES if pdfium is None else PDFIUM_PARALLEL_MIN_PAGES
+        if num_pages < min_pages or (os.cpu_count() or 1) == 1:
+            text_pages = _extract_pages(file_path, 0, num_pages)
+        else:
+            text_pages = _extract_pages_parallel(file_path, num_pages)
         text = "\n".join(text_pages).strip()
         if not text:
             raise ValueError("No text extracted from PDF (possibly scanned or image-based).")
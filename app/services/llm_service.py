@@ -4,19 +4,35 @@ services/llm_service.py
 Handles response generation using a local Ollama model.
 Takes top retrieved chunks from FAISS and the user query,
 then generates a contextual, grounded answer.
+Answers stream through an async client so concurrent queries overlap
+instead of blocking the event loop.
 """
 
 import logging
-from ollama import Client
-from app.core.config import OLLAMA_BASE_URL, OLLAMA_MODEL
+import httpx
+from ollama import AsyncClient, Client
+from app.core.config import OLLAMA_BASE_URL, OLLAMA_MODEL, OLLAMA_KEEP_ALIVE
 
 logger = logging.getLogger(__name__)
 
-# Initialize Ollama client
-ollama_client = Client(host=OLLAMA_BASE_URL)
+# Initialize Ollama clients (pooled keep-alive connections across requests)
+ollama_client = Client(host=OLLAMA_BASE_URL, limits=httpx.Limits(max_keepalive_connections=16))
+async_ollama_client = AsyncClient(host=OLLAMA_BASE_URL, limits=httpx.Limits(max_keepalive_connections=16))
 
+# Returned when the local model call fails (callers must not cache it)
+LLM_ERROR_MESSAGE = "Error generating answer from the local model."
 
-def generate_answer(chunks: list[str], query: str) -> str:
+
+def warm_up():
+    """Load the LLM into Ollama's memory ahead of the first query."""
+    try:
+        ollama_client.generate(model=OLLAMA_MODEL, prompt="", keep_alive=OLLAMA_KEEP_ALIVE)
+        logger.info(f"🔥 Ollama model ({OLLAMA_MODEL}) loaded and kept alive for {OLLAMA_KEEP_ALIVE}.")
+    except Exception as e:
+        logger.warning(f"⚠️ Ollama warm-up failed ({e}). The model will load on first query.")
+
+
+async def generate_answer(chunks: list[str], query: str) -> str:
     """
     Generates an answer using the provided text chunks as context.
 
@@ -52,21 +68,21 @@ Answer:
     logger.info(f"🧠 Sending prompt to Ollama model ({OLLAMA_MODEL}) for answer generation...")
 
     try:
-        # Ollama returns a generator for streaming; collect all chunks
-        response_stream = ollama_client.chat(
+        # Ollama returns an async generator for streaming; collect all chunks
+        response_stream = await async_ollama_client.chat(
             model=OLLAMA_MODEL,
             messages=[
                 {"role": "system", "content": "You are a factual assistant."},
                 {"role": "user", "content": prompt}
             ],
-            stream=True
+            stream=True,
+            keep_alive=OLLAMA_KEEP_ALIVE,
         )
 
         answer_parts = []
-        for chunk in response_stream:
-            message = chunk.get("message", {}).get("content", "")
-            if message:
-                answer_parts.append(message)
+        append = answer_parts.append
+        async for chunk in response_stream:
+            append(chunk.message.content or "")
 
         answer = "".join(answer_parts).strip()
         logger.info("✅ Generated answer successfully via Ollama.")
@@ -74,4 +90,4 @@ Answer:
 
     except Exception as e:
         logger.error(f"❌ Error generating answer via Ollama: {e}")
-        return "Error generating answer from the local model."
+        return LLM_ERROR_MESSAGE
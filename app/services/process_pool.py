@@ -0,0 +1,30 @@
+"""
+services/process_pool.py
+
+Shared worker-process pool for CPU-bound document processing
+(PDF page extraction and splitting very large texts), so the app
+never runs more than one set of cpu_count() worker interpreters.
+"""
+
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()  # Callers run in worker threads; create the pool only once
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, creating it on first use."""
+    global _process_pool
+    if _process_pool is None:
+        with _pool_lock:
+            if _process_pool is None:
+                # "spawn" avoids forking a process that already runs I/O threads
+                _process_pool = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _process_pool
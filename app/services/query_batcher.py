@@ -0,0 +1,107 @@
+"""
+services/query_batcher.py
+
+Micro-batches concurrent query searches into a single FAISS call.
+Query vectors arriving within QUERY_BATCH_MAX_WAIT_MS (or until
+QUERY_BATCH_MAX_SIZE is reached) are stacked into one (n, dim) matrix so
+FAISS sweeps the index once for the whole batch; results are fanned back
+out to each waiting request through its own future.
+"""
+
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import numpy as np
+from app.core.config import QUERY_BATCH_MAX_SIZE, QUERY_BATCH_MAX_WAIT_MS
+from app.services.vector_service import VectorService, get_vector_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _PendingQuery:
+    embedding: np.ndarray  # (1, dim) float32
+    top_k: int
+    future: asyncio.Future
+
+
+class QueryBatcher:
+    def __init__(
+        self,
+        vector_service: VectorService,
+        max_batch: int = QUERY_BATCH_MAX_SIZE,
+        max_wait_ms: float = QUERY_BATCH_MAX_WAIT_MS,
+    ):
+        self.vector_service = vector_service
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self):
+        """Start the background batching task on the current event loop."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+
+    async def submit(self, query_emb: np.ndarray, top_k: int) -> List[Dict]:
+        """Queue a (1, dim) query vector and wait for its top_k results."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put(_PendingQuery(query_emb, top_k, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self._search_batch(batch)
+
+    async def _search_batch(self, batch: List[_PendingQuery]):
+        k = max(p.top_k for p in batch)
+        try:
+            embs = np.vstack([p.embedding for p in batch])
+            # FAISS releases the GIL; keep the event loop free while it searches
+            results = await asyncio.to_thread(self.vector_service.search_vectors, embs, k)
+        except Exception as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        if len(batch) > 1:
+            logger.info(f"📦 Batched {len(batch)} queries into one FAISS search (k={k})")
+        for p, res in zip(batch, results):
+            if not p.future.done():
+                p.future.set_result(res[:p.top_k])
+
+
+# ----------------------------
+# Process-wide instance
+# ----------------------------
+_batcher: Optional[QueryBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> QueryBatcher:
+    """Return the shared QueryBatcher bound to the shared VectorService."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = QueryBatcher(get_vector_service())
+    return _batcher
@@ -0,0 +1,45 @@
+"""
+services/rerank_service.py
+
+Reorders FAISS candidates with a cross-encoder (BGE reranker) so that
+only the most relevant chunks are passed to the LLM.
+The model is loaded once at import time when RERANKER_ENABLED is set.
+"""
+
+import logging
+from typing import List, Dict
+from app.core.config import RERANKER_ENABLED, RERANKER_MODEL
+
+logger = logging.getLogger(__name__)
+
+# Initialize cross-encoder (optional dependency)
+cross_encoder = None
+if RERANKER_ENABLED:
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    cross_encoder = CrossEncoder(RERANKER_MODEL, device=device)
+    logger.info(f"✅ Loaded cross-encoder reranker ({RERANKER_MODEL}) on {device}")
+
+
+def rerank(query: str, results: List[Dict], top_k: int) -> List[Dict]:
+    """
+    Scores (query, chunk) pairs with the cross-encoder and keeps the best ones.
+
+    Args:
+        query (str): The user question.
+        results (List[Dict]): Candidate chunks returned by FAISS.
+        top_k (int): Number of chunks to keep after reranking.
+    Returns:
+        List[Dict]: Candidates sorted by descending relevance, truncated to top_k.
+    """
+    if cross_encoder is None or not results:
+        return results[:top_k]
+
+    pairs = [(query, r["text"]) for r in results]
+    scores = cross_encoder.predict(pairs, batch_size=32)
+
+    ranked = sorted(zip(scores, results), key=lambda pair: pair[0], reverse=True)
+    logger.info(f"🔀 Reranked {len(results)} candidates → keeping top {top_k}")
+    return [r for _, r in ranked[:top_k]]
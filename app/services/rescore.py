@@ -0,0 +1,48 @@
+"""
+services/rescore.py
+
+Exact inner-product rescoring of FAISS candidates.
+Quantized indexes (IVF-PQ, fp16 SQ) rank by approximate scores; recomputing
+q · v against the stored float32 vectors recovers the true order.
+Uses a Numba-compiled parallel kernel when numba is installed, else NumPy.
+"""
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit, prange
+except ImportError:  # Optional dependency
+    njit = None
+
+_rescore_kernel = None
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _rescore_kernel(q, cand_vecs):
+        n, d = cand_vecs.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in prange(n):
+            acc = np.float32(0.0)
+            for j in range(d):
+                acc += q[j] * cand_vecs[i, j]
+            out[i] = acc
+        return out
+
+
+def rescore(q: np.ndarray, cand_vecs: np.ndarray) -> np.ndarray:
+    """
+    Computes exact inner products between one query and its candidates.
+
+    Args:
+        q (np.ndarray): (dim,) float32 query vector.
+        cand_vecs (np.ndarray): (n, dim) float32 candidate vectors.
+    Returns:
+        np.ndarray: (n,) float32 scores, higher = more similar.
+    """
+    q = np.ascontiguousarray(q, dtype=np.float32)
+    cand_vecs = np.ascontiguousarray(cand_vecs, dtype=np.float32)
+    if _rescore_kernel is not None:
+        return _rescore_kernel(q, cand_vecs)
+    return cand_vecs @ q
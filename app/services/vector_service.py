@@ -2,204 +2,813 @@
 services/vector_service.py
 
 Handles vector storage and retrieval using FAISS.
+Vectors are L2-normalized and searched by inner product (cosine similarity),
+using an HNSW graph index by default, an exact flat index, or a quantized
+(IVF-PQ / fp16 or int8 scalar quantizer) index to cut memory.
 Ensures embedding dimensions match OpenAI/Ollama embeddings,
 and maintains JSON-safe metadata for each stored chunk.
 """
 
 import os
 import json
+import uuid
+import time
+import atexit
+import math
+import mmap
+import ctypes
 import logging
+import sqlite3
+import threading
 import faiss
 import numpy as np
 from pathlib import Path
-from typing import List, Dict
-from app.core.config import DATA_DIR, FAISS_INDEX_PATH, METADATA_PATH
+from typing import Callable, List, Dict, Optional
+from app.core.config import (
+    DATA_DIR,
+    EMBEDDING_MODEL,
+    FAISS_INDEX_PATH,
+    METADATA_PATH,
+    EMBEDDINGS_PATH,
+    INDEX_META_PATH,
+    LEGACY_FAISS_INDEX_PATH,
+    LEGACY_METADATA_PATH,
+    FAISS_INDEX_TYPE,
+    HNSW_M,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    IVF_NLIST,
+    IVF_NPROBE,
+    IVF_TRAIN_SIZE,
+    PQ_M,
+    PQ_NBITS,
+    AUTO_IVF_MIN_VECTORS,
+    RESCORE_OVERSAMPLE,
+    FAISS_USE_GPU,
+    FAISS_GPU_FP16,
+    FAISS_OMP_THREADS,
+    FAISS_HUGEPAGES,
+    PERSIST_MIN_VECTORS,
+    PERSIST_INTERVAL_SECONDS,
+    INDEX_COMPACT_MIN_LIVE,
+)
 from app.services.embedding_service import get_single_embedding
+from app.services.rescore import rescore
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+GPU_MAX_K = 2048  # Largest k FAISS GPU indexes can return per query
+
+
+def _atomic_write(path: Path, write: Callable[[str], None]):
+    """Write via a temp file + rename so memory-mapped readers never see a truncated file."""
+    tmp = path.with_name(f"{path.stem}.tmp{path.suffix}")
+    write(str(tmp))
+    os.replace(tmp, path)
+
+
+def _read_json(path: Path):
+    """Parse a JSON file, with orjson when installed (much faster on large legacy metadata files)."""
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _advise_hugepages(arr: Optional[np.ndarray]):
+    """Ask the kernel to back a large array with transparent huge pages (fewer TLB misses)."""
+    if not FAISS_HUGEPAGES or arr is None or not hasattr(mmap, "MADV_HUGEPAGE"):
+        return
+    # madvise needs a page-aligned range; skip the partial pages at either end
+    start = arr.ctypes.data
+    aligned = -(-start // mmap.PAGESIZE) * mmap.PAGESIZE
+    length = (start + arr.nbytes - aligned) // mmap.PAGESIZE * mmap.PAGESIZE
+    if length <= 0:
+        return
+    libc = ctypes.CDLL(None, use_errno=True)
+    if libc.madvise(ctypes.c_void_p(aligned), ctypes.c_size_t(length), mmap.MADV_HUGEPAGE) != 0:
+        logger.debug(f"madvise(MADV_HUGEPAGE) failed: {os.strerror(ctypes.get_errno())}")
+
 
 class VectorService:
-    def __init__(self):
+    def __init__(self, persist: bool = True):
+        """
+        Args:
+            persist (bool): Load and save the index under DATA_DIR. False keeps it
+                in memory only (experiments), never touching the persisted files.
+        """
+        self.persist = persist
         os.makedirs(DATA_DIR, exist_ok=True)
+        faiss.omp_set_num_threads(FAISS_OMP_THREADS)
+        self.num_gpus = faiss.get_num_gpus() if FAISS_USE_GPU else 0
+        self._gpu_res = None
+        self._on_gpu = False  # Whether self.index was placed on GPU by _to_device
         self.index = None
-        self.metadata: Dict[str, Dict] = {}
+        self.metadata: Dict[int, Dict] = {}  # vector id -> chunk metadata
+        self.embeddings: Optional[np.ndarray] = None  # (N, dim) float32, row = vector id
+        # True while self.embeddings is the memory-mapped EMBEDDINGS_PATH (inserts append to the file).
+        # Rebuilds and in-memory services hold the matrix in RAM until the next flush rewrites the file.
+        self._emb_on_disk = persist
+        self._emb_buf: Optional[np.ndarray] = None  # Spare-capacity buffer an in-memory matrix is a prefix of
         self.dim = None
-        self._load()
+        self.factory: Optional[str] = None  # index_factory description of the current index
+        # Identifies the index contents: renewed on every mutation and persisted in the sidecar,
+        # so query caches shared across workers and restarts can key on it
+        self.generation = uuid.uuid4().hex
+        self._lock = threading.RLock()  # Searches may run in worker threads alongside writes
+        # Debounced persistence: mutations mark the service dirty and are written by flush()
+        self._dirty = False
+        self._changed_since_persist = 0
+        self._last_persisted_t = time.monotonic()
+        self._flush_timer: Optional[threading.Timer] = None
+        # Metadata rows written by the next flush: new vector ids, or everything after a rebuild
+        self._meta_conn: Optional[sqlite3.Connection] = None
+        self._pending_vids: List[int] = []
+        self._pending_deletes: List[str] = []  # doc_ids removed in place since the last flush
+        self._meta_rewrite = False
+        if persist:
+            self._load()
+            atexit.register(self.flush)
 
     # ----------------------------
     # Initialization & Persistence
     # ----------------------------
     def _load(self):
-        """Load FAISS index and metadata if they exist."""
+        """Load FAISS index, metadata and raw vectors if they match the embedding model."""
         try:
-            if METADATA_PATH.exists():
-                with open(METADATA_PATH, "r", encoding="utf-8") as f:
-                    self.metadata = json.load(f)
-                    self.dim = self.metadata.get("_dim")
-
-            if FAISS_INDEX_PATH.exists() and self.dim:
-                self.index = faiss.read_index(str(FAISS_INDEX_PATH))
-                logger.info(
-                    f"✅ Loaded FAISS index with dim={self.dim}, total vectors={self.index.ntotal}"
+            migrated = self._migrate_legacy_files()
+
+            if not FAISS_INDEX_PATH.exists():
+                logger.info("ℹ️ No existing FAISS index found. Will create a new one on first insert.")
+                # Vectors appended before a crash that preceded the first flush have no index or metadata
+                self._emb_on_disk = not EMBEDDINGS_PATH.exists()
+                return
+
+            self.index = faiss.read_index(str(FAISS_INDEX_PATH))
+            self.dim = self.index.d
+            if migrated:
+                self._write_index_meta()
+            index_meta = self._read_index_meta()
+            if not self._index_meta_matches(index_meta):
+                logger.warning(
+                    f"⚠️ Persisted FAISS index does not match model={EMBEDDING_MODEL}, dim={self.index.d}. "
+                    "Discarding it; a new index will be built on first insert."
                 )
+                self._discard_persisted()
+                return
+
+            self.factory = index_meta.get("factory")
+            self.generation = index_meta.get("generation") or self.generation
+            self.embeddings = self._read_embeddings()
+            self.metadata = self._read_metadata()
+            if self._needs_upgrade():
+                self._upgrade_index()
             else:
-                logger.info("ℹ️ No existing FAISS index found. Will create a new one on first insert.")
+                self.index = self._to_device(self.index)
+            logger.info(
+                f"✅ Loaded FAISS index ({self.factory or type(self.index).__name__}) "
+                f"with dim={self.dim}, total vectors={self.index.ntotal}"
+            )
         except Exception as e:
             logger.error(f"❌ Failed to load FAISS index or metadata: {e}")
             self.metadata = {}
+            self.embeddings = None
+            self._emb_on_disk = False  # Rewrite the vector file on the next flush
             self.index = None
             self.dim = None
 
+    @staticmethod
+    def _migrate_legacy_files() -> bool:
+        """Move the unkeyed index to the model-keyed path (one-time; metadata.json is converted on read)."""
+        if not LEGACY_FAISS_INDEX_PATH.exists() or FAISS_INDEX_PATH.exists():
+            return False
+        LEGACY_FAISS_INDEX_PATH.replace(FAISS_INDEX_PATH)
+        logger.info(f"📦 Migrated legacy FAISS index to {FAISS_INDEX_PATH.name}")
+        return True
+
+    @staticmethod
+    def _read_index_meta() -> Dict:
+        """Read the sidecar file ({} if missing)."""
+        if not INDEX_META_PATH.exists():
+            return {}
+        return _read_json(INDEX_META_PATH)
+
+    def _index_meta_matches(self, meta: Dict) -> bool:
+        """Check the sidecar contents against the configured model and loaded index."""
+        return meta.get("model") == EMBEDDING_MODEL and meta.get("dim") == self.index.d
+
+    def _write_index_meta(self, committed: bool = True):
+        """
+        Record which embedding model, dimension and index layout the index was built with.
+        The generation is only recorded once every file of it is written (`committed`), so a
+        crash mid-write makes the next load pick a fresh one instead of reusing cached answers.
+        """
+        meta = {"model": EMBEDDING_MODEL, "dim": self.dim, "factory": self.factory}
+        if committed:
+            meta["generation"] = self.generation
+        if orjson is not None:
+            INDEX_META_PATH.write_bytes(orjson.dumps(meta))
+        else:
+            with open(INDEX_META_PATH, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+
+    def reset(self):
+        """Drop all vectors and metadata from memory; persisted files are replaced by the next flush."""
+        with self._lock:
+            self.index = None
+            self.metadata = {}
+            self.embeddings = None
+            self._emb_buf = None
+            self._emb_on_disk = False  # The old file is replaced by the next flush
+            self.dim = None
+            self.factory = None
+            self._dirty = False
+            self._pending_vids = []
+            self._pending_deletes = []
+            self._meta_rewrite = True  # Stale rows must not survive the next metadata write
+            self.generation = uuid.uuid4().hex
+
+    def _discard_persisted(self):
+        """Reset in-memory state and delete persisted index files."""
+        self.reset()
+        if not self.persist:
+            return
+        if self._meta_conn is not None:
+            self._meta_conn.close()
+            self._meta_conn = None
+        sqlite_files = [METADATA_PATH.with_name(METADATA_PATH.name + suffix) for suffix in ("-wal", "-shm")]
+        for path in (FAISS_INDEX_PATH, METADATA_PATH, *sqlite_files, EMBEDDINGS_PATH, INDEX_META_PATH,
+                     LEGACY_METADATA_PATH):
+            if path.exists():
+                path.unlink()
+        self._emb_on_disk = True  # No file, no vectors
+
+    def _meta_db(self) -> sqlite3.Connection:
+        """Open (and create) the SQLite metadata store on first use."""
+        if self._meta_conn is None:
+            # Flushes may run on the debounce timer thread; self._lock serializes access
+            self._meta_conn = sqlite3.connect(str(METADATA_PATH), check_same_thread=False)
+            self._meta_conn.execute("PRAGMA journal_mode=WAL")
+            self._meta_conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                "vid INTEGER PRIMARY KEY, doc_id TEXT, source TEXT, chunk_id INTEGER, text TEXT, embedding_dim INTEGER)"
+            )
+        return self._meta_conn
+
+    def _read_metadata(self) -> Dict[int, Dict]:
+        """Load chunk metadata from SQLite, converting the metadata.json of earlier versions if needed."""
+        if METADATA_PATH.exists():
+            # Rows past the persisted vectors (e.g. a crash between writes) have nothing to match
+            id_limit = len(self.embeddings) if self.embeddings is not None else self.index.ntotal
+            rows = self._meta_db().execute(
+                "SELECT vid, doc_id, source, chunk_id, text, embedding_dim FROM meta WHERE vid < ? ORDER BY vid",
+                (id_limit,),
+            )
+            return {
+                vid: {"doc_id": doc_id, "source": source, "chunk_id": chunk_id, "text": text, "embedding_dim": dim}
+                for vid, doc_id, source, chunk_id, text, dim in rows
+            }
+
+        if not LEGACY_METADATA_PATH.exists():
+            return {}
+
+        # Vectors are kept in the raw vector file; drop the per-chunk embedding copies
+        legacy = _read_json(LEGACY_METADATA_PATH)
+        self.metadata = {
+            int(k): {key: val for key, val in v.items() if key != "embedding"}
+            for k, v in legacy.items()
+            if isinstance(v, dict) and not k.startswith("_")
+        }
+        self._meta_rewrite = True
+        self._persist_metadata()
+        LEGACY_METADATA_PATH.unlink()
+        logger.info(f"📦 Converted {LEGACY_METADATA_PATH.name} to {METADATA_PATH.name}")
+        return self.metadata
+
+    def _read_embeddings(self) -> Optional[np.ndarray]:
+        """Memory-map the raw vector matrix, reconstructing it from the index if missing."""
+        if EMBEDDINGS_PATH.exists():
+            return self._map_embeddings()
+
+        # Earlier versions saved the matrix as .npy; re-save its rows as the raw file
+        npy_path = EMBEDDINGS_PATH.with_suffix(".npy")
+        if npy_path.exists():
+            self.embeddings = np.load(npy_path, mmap_mode="r")
+            self._emb_on_disk = False
+            self._save_embeddings()
+            npy_path.unlink()
+            return self.embeddings
+
+        # Indexes saved before the raw vector store: flat/HNSW indexes can return their vectors
+        try:
+            embeddings = self.index.reconstruct_n(0, self.index.ntotal)
+        except RuntimeError:
+            logger.warning("⚠️ Index cannot reconstruct vectors; deletes will not be able to rebuild it.")
+            return None
+        self.embeddings = embeddings
+        self._emb_on_disk = False
+        self._save_embeddings()
+        return self.embeddings
+
+    def _map_embeddings(self) -> Optional[np.ndarray]:
+        """Read-only memory map of the rows in EMBEDDINGS_PATH (None if it holds none)."""
+        row_bytes = 4 * self.dim
+        size = EMBEDDINGS_PATH.stat().st_size
+        if size % row_bytes:
+            # Drop a row partially written by a crash so later appends stay aligned
+            os.truncate(EMBEDDINGS_PATH, size - size % row_bytes)
+        n = size // row_bytes
+        if n == 0:
+            return None
+        return np.memmap(EMBEDDINGS_PATH, dtype="float32", mode="r", shape=(n, self.dim))
+
+    def _mark_dirty(self, changed: int):
+        """Record an unsaved mutation of `changed` vectors; persist now if enough changed, else within the interval."""
+        if not self.persist:
+            self._pending_vids = []
+            self._pending_deletes = []
+            return
+        self._dirty = True
+        self._changed_since_persist += changed
+        if self._changed_since_persist >= PERSIST_MIN_VECTORS or time.monotonic() - self._last_persisted_t >= PERSIST_INTERVAL_SECONDS:
+            self.flush()
+        elif self._flush_timer is None:
+            self._flush_timer = threading.Timer(PERSIST_INTERVAL_SECONDS, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Write the index, raw vectors and metadata to disk if there are unsaved changes."""
+        with self._lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            try:
+                if self.index is not None:
+                    self._write_index_meta(committed=False)
+                self._save_index()
+                self._save_embeddings()
+                self._persist_metadata()
+                if self.index is not None:
+                    self._write_index_meta()
+            except Exception as e:
+                logger.error(f"❌ Failed to persist FAISS index: {e}")
+                return
+            self._dirty = False
+            self._changed_since_persist = 0
+            self._last_persisted_t = time.monotonic()
+            logger.info(f"💾 Persisted FAISS index ({self.index.ntotal if self.index is not None else 0} vectors).")
+
+    def _needs_upgrade(self) -> bool:
+        """True for a loaded index in a layout this version no longer writes."""
+        if self.index.metric_type != faiss.METRIC_INNER_PRODUCT:
+            return True
+        if isinstance(self.index, faiss.IndexIDMap):
+            # IDMap2 over IVF maps ids wrongly after remove_ids (IVF does not shift rows down)
+            return not isinstance(self.index, faiss.IndexIDMap2) or isinstance(self._inner(), faiss.IndexIVF)
+        return not isinstance(self.index, faiss.IndexIVF)
+
+    def _upgrade_index(self):
+        """
+        Rebuild an index saved by older versions: L2 distance becomes normalized
+        inner product, and a bare index gets the id layout deletes rely on.
+        """
+        if self.embeddings is None:
+            raise ValueError("Index has no stored vectors to rebuild from")
+        embs = np.array(self.embeddings, dtype="float32")
+        faiss.normalize_L2(embs)
+        self.embeddings = embs
+        self._emb_on_disk = False
+        # Rows without metadata were deleted in place; keep them out of the rebuilt index
+        ids = self._live_ids() if self.metadata else np.arange(len(embs), dtype="int64")
+        self.index = self._index_from_vectors(np.ascontiguousarray(embs[ids]), ids)
+        self.generation = uuid.uuid4().hex  # Scores changed
+        self._write_index_meta(committed=False)
+        self._save_index()
+        self._save_embeddings()
+        self._write_index_meta()
+        logger.info(f"📦 Rebuilt persisted index as {self.factory} ({len(embs)} vectors)")
+
     def _persist_metadata(self):
-        """Persist metadata dictionary to JSON file (JSON-safe)."""
-        meta_copy = {}
-        for k, v in self.metadata.items():
-            if isinstance(v, dict):
-                safe_meta = {}
-                for key, val in v.items():
-                    if isinstance(val, (np.integer, np.floating)):
-                        val = val.item()
-                    elif isinstance(val, (np.ndarray, list)):
-                        continue  # skip raw embeddings
-                    safe_meta[key] = val
-                meta_copy[k] = safe_meta
-        if self.dim:
-            meta_copy["_dim"] = self.dim
-        with open(METADATA_PATH, "w", encoding="utf-8") as f:
-            json.dump(meta_copy, f, ensure_ascii=False, indent=2)
+        """Write pending metadata rows to SQLite in one transaction (all rows after a rebuild)."""
+        if self._meta_rewrite:
+            vids = list(self.metadata)
+        elif self._pending_vids or self._pending_deletes:
+            vids = self._pending_vids
+        else:
+            return
+        rows = [
+            (vid, m.get("doc_id"), m.get("source"), m.get("chunk_id"), m.get("text"), m.get("embedding_dim"))
+            for vid in vids
+            if (m := self.metadata.get(vid)) is not None
+        ]
+        conn = self._meta_db()
+        with conn:
+            if self._meta_rewrite:
+                conn.execute("DELETE FROM meta")
+            else:
+                conn.executemany("DELETE FROM meta WHERE doc_id = ?", [(d,) for d in self._pending_deletes])
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._pending_vids = []
+        self._pending_deletes = []
+        self._meta_rewrite = False
+
+    def _save_embeddings(self):
+        """Write an in-memory raw vector matrix to disk and switch to memory-mapping it (appends are already on disk)."""
+        if self._emb_on_disk or self.embeddings is None:
+            return
+        embeddings = np.ascontiguousarray(self.embeddings, dtype="float32")
+        _atomic_write(EMBEDDINGS_PATH, embeddings.tofile)
+        self.embeddings = self._map_embeddings()
+        self._emb_buf = None
+        self._emb_on_disk = True
 
     def _save_index(self):
-        """Save FAISS index to disk."""
+        """Save FAISS index to disk (always the CPU copy)."""
         if self.index is not None:
-            faiss.write_index(self.index, str(FAISS_INDEX_PATH))
+            index = faiss.index_gpu_to_cpu(self.index) if self._on_gpu else self.index
+            faiss.write_index(index, str(FAISS_INDEX_PATH))
+
+    # ----------------------------
+    # GPU Placement
+    # ----------------------------
+    def _to_device(self, index: faiss.Index) -> faiss.Index:
+        """Copy a CPU index to the GPU(s) when available; unsupported types stay on CPU."""
+        self._on_gpu = False
+        if self.num_gpus == 0:
+            return index
+        try:
+            if self.num_gpus > 1:
+                co = faiss.GpuMultipleClonerOptions()
+                co.useFloat16 = FAISS_GPU_FP16
+                gpu_index = faiss.index_cpu_to_all_gpus(index, co=co)
+            else:
+                if self._gpu_res is None:
+                    self._gpu_res = faiss.StandardGpuResources()
+                co = faiss.GpuClonerOptions()
+                co.useFloat16 = FAISS_GPU_FP16
+                gpu_index = faiss.index_cpu_to_gpu(self._gpu_res, 0, index, co)
+        except Exception as e:
+            logger.info(f"ℹ️ Keeping {type(index).__name__} on CPU (not GPU-compatible: {e})")
+            return index
+        self._on_gpu = True
+        return gpu_index
 
     # ----------------------------
     # Core Operations
     # ----------------------------
+    @staticmethod
+    def _ivf_nlist(n: int) -> int:
+        """Inverted lists for n vectors: fixed for "ivfpq", ~sqrt(N) for "auto"."""
+        return IVF_NLIST if FAISS_INDEX_TYPE == "ivfpq" else max(1, int(math.sqrt(n)))
+
+    @classmethod
+    def _ivf_trainable(cls, n: int) -> bool:
+        """True when n vectors are enough to train IVF-PQ (~39 points per centroid, per FAISS guidance)."""
+        if FAISS_INDEX_TYPE == "auto" and n < AUTO_IVF_MIN_VECTORS:
+            return False
+        return n >= 39 * max(cls._ivf_nlist(n), 2 ** PQ_NBITS)
+
+    @classmethod
+    def _factory_string(cls, dim: int, n: int) -> str:
+        """
+        index_factory description of the configured index type for n vectors.
+        Vector ids stay stable so deletes can remove in place: IVF indexes store ids
+        natively, every other type is wrapped in IDMap2. (IDMap2 must not wrap IVF: its
+        remove_ids assumes the inner index shifts rows down, which IVF does not.)
+        """
+        if FAISS_INDEX_TYPE == "hnsw":
+            return f"IDMap2,HNSW{HNSW_M},Flat"
+        if FAISS_INDEX_TYPE == "sq_fp16":
+            return "IDMap2,SQfp16"
+        if FAISS_INDEX_TYPE == "sq_int8":
+            return "IDMap2,SQ8"
+        if FAISS_INDEX_TYPE in ("ivfpq", "auto") and cls._ivf_trainable(n):
+            # PQ needs a sub-quantizer count that divides the dimension
+            m = max(d for d in range(1, PQ_M + 1) if dim % d == 0)
+            return f"IVF{cls._ivf_nlist(n)},PQ{m}x{PQ_NBITS}"
+        # "flat", and "ivfpq"/"auto" until there are enough vectors to train
+        return "IDMap2,Flat"
+
+    @staticmethod
+    def _build_index(dim: int, factory: str) -> faiss.Index:
+        """Build an empty cosine-similarity (inner product) index from a factory string."""
+        index = faiss.index_factory(dim, factory, faiss.METRIC_INNER_PRODUCT)
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(inner, faiss.IndexHNSW):
+            inner.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    def _inner(self) -> faiss.Index:
+        """The index behind the IDMap2 wrapper (if any), where type checks and search parameters apply."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return faiss.downcast_index(self.index.index)
+        return self.index
+
+    def _live_ids(self) -> np.ndarray:
+        """Vector ids currently in the index (deleted ids leave gaps until compaction)."""
+        return np.fromiter(self.metadata, dtype="int64", count=len(self.metadata))
+
+    def _can_train_ivfpq(self, n: int) -> bool:
+        """True once an untrained "ivfpq"/"auto" configuration holding n vectors has enough to train."""
+        return (
+            FAISS_INDEX_TYPE in ("ivfpq", "auto")
+            and not hasattr(self._inner(), "nprobe")
+            and self._ivf_trainable(n)
+        )
+
+    @staticmethod
+    def _sq_int8_retrain_due(before: int, after: int) -> bool:
+        """
+        "sq_int8" learns per-dimension value ranges from its training vectors, so an index
+        trained on the first small document would clip later ones. Retrain on all vectors
+        each time the count doubles, until IVF_TRAIN_SIZE vectors have been seen.
+        """
+        return (
+            FAISS_INDEX_TYPE == "sq_int8"
+            and 0 < before < IVF_TRAIN_SIZE
+            and after.bit_length() > before.bit_length()
+        )
+
+    def _index_from_vectors(self, embs: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """Build a fresh index of the configured type holding `embs` (normalized) under vector `ids`."""
+        dim = embs.shape[1]
+        self.factory = self._factory_string(dim, len(embs))
+        index = self._build_index(dim, self.factory)
+        if not index.is_trained:
+            logger.info(f"🧠 Training {self.factory} index on {min(len(embs), IVF_TRAIN_SIZE)} vectors")
+            index.train(embs[:IVF_TRAIN_SIZE])
+        index = self._to_device(index)
+        index.add_with_ids(embs, ids)
+        return index
+
     def _ensure_index(self, dim: int):
         """Create a new FAISS index if not already initialized."""
         if self.index is None:
-            logger.info(f"🧠 Initializing new FAISS index (dim={dim})")
-            self.index = faiss.IndexFlatL2(dim)
+            self.factory = self._factory_string(dim, 0)
+            logger.info(f"🧠 Initializing new FAISS {self.factory} index (dim={dim})")
+            self.index = self._to_device(self._build_index(dim, self.factory))
             self.dim = dim
 
-    def add_embeddings(self, embeddings: List[List[float]], metadatas: List[Dict]) -> List[int]:
-        """Add new embeddings to FAISS index with metadata."""
-        if not embeddings:
-            raise ValueError("No embeddings to add to FAISS index.")
+    def add_embeddings(self, emb_arr: np.ndarray, texts: List[str], doc_id: str, source: str) -> List[int]:
+        """
+        Add one document's chunk embeddings to the FAISS index.
 
-        embs = np.array(embeddings, dtype="float32")
-        dim = embs.shape[1]
-        self._ensure_index(dim)
+        Args:
+            emb_arr (np.ndarray): (N, dim) float32 matrix, row i = embedding of texts[i].
+            texts (List[str]): Chunk texts; the list position becomes the chunk_id.
+            doc_id (str): Document identifier shared by all chunks.
+            source (str): Original filename.
+        Returns:
+            List[int]: Vector ids assigned to the chunks.
+        """
+        with self._lock:
+            embs = np.ascontiguousarray(emb_arr, dtype="float32")
+            if embs.ndim != 2 or len(embs) == 0:
+                raise ValueError("No embeddings to add to FAISS index.")
+            if len(embs) != len(texts):
+                raise ValueError(f"❌ Got {len(embs)} embeddings for {len(texts)} chunks")
 
-        if self.dim != dim:
-            raise ValueError(f"❌ Embedding dimension mismatch: FAISS({self.dim}) vs embeddings({dim})")
+            dim = embs.shape[1]
+            self._ensure_index(dim)
 
-        start_id = int(self.index.ntotal)
-        self.index.add(embs)
+            if self.dim != dim:
+                raise ValueError(f"❌ Embedding dimension mismatch: FAISS({self.dim}) vs embeddings({dim})")
 
-        # Store metadata for each vector
-        for i, meta in enumerate(metadatas):
-            vid = str(start_id + i)
-            meta = dict(meta)
-            meta["embedding_dim"] = dim
-            self.metadata[vid] = meta
+            # Ids are never reused: the next id is the next row of the raw vector matrix
+            start_id = len(self.embeddings) if self.embeddings is not None else 0
+            new_ids = np.arange(start_id, start_id + len(embs), dtype="int64")
+            if embs is emb_arr:
+                embs = embs.copy()  # normalize_L2 works in place; leave the caller's array alone
+            faiss.normalize_L2(embs)
 
-        self._save_index()
-        self._persist_metadata()
+            # Keep raw vectors (row = vector id) so the index can be rebuilt without re-embedding
+            self._append_embeddings(embs)
 
-        logger.info(f"✅ Added {len(embeddings)} vectors. Total vectors now: {self.index.ntotal}")
-        return list(range(start_id, start_id + len(embeddings)))
+            total = self.index.ntotal + len(embs)
+            if self._can_train_ivfpq(total) or self._sq_int8_retrain_due(self.index.ntotal, total):
+                # Enough data collected: replace the interim flat index with a trained IVF-PQ index,
+                # or retrain int8 ranges on the grown vector set
+                ids = np.concatenate([self._live_ids(), new_ids])
+                all_embs = np.ascontiguousarray(self.embeddings[ids], dtype="float32")
+                self.index = self._index_from_vectors(all_embs, ids)
+            else:
+                if not self.index.is_trained:
+                    self.index.train(embs)
+                self.index.add_with_ids(embs, new_ids)
 
-    def search(self, query: str, top_k: int = 4) -> List[Dict]:
-        """Perform similarity search for a given text query."""
+            # Store metadata for each vector (vectors live in the raw vector file, not in metadata)
+            for i, text in enumerate(texts):
+                self.metadata[start_id + i] = {
+                    "doc_id": doc_id,
+                    "source": source,
+                    "chunk_id": i,
+                    "text": text,
+                    "embedding_dim": dim,
+                }
+            self._pending_vids.extend(range(start_id, start_id + len(embs)))
+
+            self.generation = uuid.uuid4().hex
+            self._mark_dirty(len(embs))
+
+            logger.info(f"✅ Added {len(embs)} vectors. Total vectors now: {self.index.ntotal}")
+            return list(range(start_id, start_id + len(embs)))
+
+    def _append_embeddings(self, embs: np.ndarray):
+        """
+        Append rows to the raw vector matrix. A file-backed matrix grows on disk and is
+        re-mapped; an in-memory one is written into a preallocated buffer that grows
+        geometrically, so inserts do not copy the whole matrix each time.
+        """
+        if self._emb_on_disk:
+            with open(EMBEDDINGS_PATH, "ab") as f:
+                embs.tofile(f)
+            self.embeddings = self._map_embeddings()
+            return
+
+        n = len(self.embeddings) if self.embeddings is not None else 0
+        need = n + len(embs)
+        buf = self._emb_buf
+        if buf is None or self.embeddings is None or self.embeddings.base is not buf or len(buf) < need:
+            # First insert, a rebuilt matrix, or out of capacity: move to a larger buffer
+            buf = np.empty((max(need, 2 * n), embs.shape[1]), dtype="float32")
+            if n:
+                buf[:n] = self.embeddings
+            self._emb_buf = buf
+            _advise_hugepages(buf)
+        buf[n:need] = embs
+        self.embeddings = buf[:need]
+
+    def embed_query(self, query: str) -> np.ndarray:
+        """Embed a query as a (1, dim) float32 row, L2-normalized for cosine similarity."""
         if self.index is None or self.index.ntotal == 0:
             raise ValueError("FAISS index is empty. Upload documents first.")
 
-        query_emb = np.array([get_single_embedding(query)], dtype="float32")
+        query_emb = np.array(get_single_embedding(query), dtype="float32").reshape(1, -1)  # writable copy
         if query_emb.shape[1] != self.dim:
             raise ValueError(f"❌ Query embedding dimension mismatch: {query_emb.shape[1]} vs index {self.dim}")
+        faiss.normalize_L2(query_emb)
+        return query_emb
 
-        distances, indices = self.index.search(query_emb, top_k)
-        results = []
-        for dist, idx in zip(distances[0], indices[0]):
-            meta = self.metadata.get(str(idx))
-            if not meta:
-                continue
-            results.append(
-                {
-                    "vector_id": int(idx),
-                    "distance": float(dist),
-                    "text": meta.get("text", ""),
-                    "doc_id": meta.get("doc_id"),
-                    "source": meta.get("source"),
-                    "chunk_id": meta.get("chunk_id"),
-                }
-            )
+    def search_vectors(self, query_embs: np.ndarray, top_k: int = 4) -> List[List[Dict]]:
+        """Search a (n, dim) batch of query vectors in one FAISS call; one result list per query."""
+        with self._lock:
+            if self.index is None or self.index.ntotal == 0:
+                raise ValueError("FAISS index is empty. Upload documents first.")
+
+            inner = self._inner()
+            if hasattr(inner, "nprobe"):  # CPU or GPU IVF index
+                inner.nprobe = IVF_NPROBE
+
+            # Inner-product scores are similarities; report cosine distance (lower = better)
+            exact_rescore = RESCORE_OVERSAMPLE > 1 and self._is_quantized()
+            k = min(top_k * RESCORE_OVERSAMPLE, self.index.ntotal) if exact_rescore else top_k
+            if self._on_gpu:
+                k = min(k, GPU_MAX_K)
+            if isinstance(inner, faiss.IndexHNSW):
+                inner.hnsw.efSearch = max(HNSW_EF_SEARCH, k)
+            scores, indices = self.index.search(query_embs, k)
+
+            batch_results = []
+            metadata = self.metadata
+            for query_emb, row_scores, row_indices in zip(query_embs, scores, indices):
+                if exact_rescore:
+                    row_scores, row_indices = self._rescore(query_emb, row_indices, top_k)
+                # Convert each row once to Python ints/floats (missing results come back as id -1)
+                distances = (1.0 - row_scores).tolist()
+                batch_results.append([
+                    {
+                        "vector_id": idx,
+                        "distance": distance,
+                        "text": meta.get("text", ""),
+                        "doc_id": meta.get("doc_id"),
+                        "source": meta.get("source"),
+                        "chunk_id": meta.get("chunk_id"),
+                    }
+                    for idx, distance in zip(row_indices.tolist(), distances)
+                    if (meta := metadata.get(idx))
+                ])
+            return batch_results
+
+    def _is_quantized(self) -> bool:
+        """True when the index ranks by approximate (compressed) scores."""
+        inner = self._inner()
+        return hasattr(inner, "nprobe") or isinstance(inner, faiss.IndexScalarQuantizer)
+
+    def _rescore(self, query_emb: np.ndarray, candidates: np.ndarray, top_k: int):
+        """Re-rank FAISS candidates by exact inner product against the stored vectors."""
+        candidates = candidates[candidates >= 0]
+        exact = rescore(query_emb, self.embeddings[candidates])
+        order = np.argsort(-exact, kind="stable")[:top_k]
+        return exact[order], candidates[order]
+
+    def search(self, query: str, top_k: int = 4) -> List[Dict]:
+        """Perform similarity search for a given text query."""
+        results = self.search_vectors(self.embed_query(query), top_k)[0]
         logger.info(f"🔍 Retrieved {len(results)} results for query.")
         return results
 
     def list_documents(self) -> List[Dict]:
         """Return JSON-safe summary of all indexed documents."""
         docs: Dict[str, Dict] = {}
-        for meta in self.metadata.values():
-            if not isinstance(meta, dict):
-                continue
-            doc_id = str(meta.get("doc_id")) if meta.get("doc_id") else None
-            if not doc_id:
-                continue
-            src = str(meta.get("source", "unknown"))
-            docs.setdefault(doc_id, {"doc_id": doc_id, "source": src, "chunks": 0})
-            docs[doc_id]["chunks"] += 1
+        with self._lock:  # Uploads and deletes mutate metadata from worker threads
+            for meta in self.metadata.values():
+                if not isinstance(meta, dict):
+                    continue
+                doc_id = str(meta.get("doc_id")) if meta.get("doc_id") else None
+                if not doc_id:
+                    continue
+                src = str(meta.get("source", "unknown"))
+                docs.setdefault(doc_id, {"doc_id": doc_id, "source": src, "chunks": 0})
+                docs[doc_id]["chunks"] += 1
 
         result = list(docs.values())
         logger.info(f"📚 list_documents -> {len(result)} docs found")
         return result
 
-    def delete_document(self, doc_id: str) -> bool:
-        """Delete a document and rebuild FAISS index without its embeddings."""
-        remaining = []
-        for meta in self.metadata.values():
-            if not isinstance(meta, dict):
-                continue
-            if meta.get("doc_id") != doc_id:
-                remaining.append(meta)
-
-        if len(remaining) == len(self.metadata):
-            logger.warning(f"⚠️ No document found with id={doc_id}")
+    def _remove_ids(self, vids: List[int]) -> bool:
+        """Remove vectors from the index in place; False if the index type cannot (HNSW, most GPU indexes)."""
+        try:
+            self.index.remove_ids(np.array(vids, dtype="int64"))
+            return True
+        except RuntimeError:
             return False
 
-        if not remaining:
-            # Reset everything
-            self.index = None
-            self.metadata = {}
-            self.dim = None
-            if FAISS_INDEX_PATH.exists():
-                FAISS_INDEX_PATH.unlink()
-            if METADATA_PATH.exists():
-                METADATA_PATH.unlink()
-            logger.info("🧹 All documents removed. FAISS index reset.")
+    def delete_document(self, doc_id: str) -> bool:
+        """Delete a document's vectors, removing them in place or compacting the index."""
+        with self._lock:
+            removed = [vid for vid, meta in self.metadata.items() if meta.get("doc_id") == doc_id]
+
+            if not removed:
+                logger.warning(f"⚠️ No document found with id={doc_id}")
+                return False
+
+            if len(removed) == len(self.metadata):
+                # Reset everything
+                self._discard_persisted()
+                logger.info("🧹 All documents removed. FAISS index reset.")
+                return True
+
+            # Deleted ids leave unused rows in the raw vector matrix; compact once too few are live
+            live = len(self.metadata) - len(removed)
+            allocated = len(self.embeddings) if self.embeddings is not None else 0
+            if live >= INDEX_COMPACT_MIN_LIVE * allocated and self._remove_ids(removed):
+                for vid in removed:
+                    del self.metadata[vid]
+                self._pending_deletes.append(doc_id)
+                logger.info(f"🗑️ Deleted doc_id={doc_id}. Removed {len(removed)} vectors in place.")
+            else:
+                if not self._compact(doc_id):
+                    return False
+                logger.info(f"🗑️ Deleted doc_id={doc_id}. Rebuilt index with {self.index.ntotal} vectors.")
+
+            self.generation = uuid.uuid4().hex
+            self._mark_dirty(len(removed))
             return True
 
-        # Rebuild FAISS
-        embeddings = [np.array(m["embedding"], dtype="float32") for m in remaining if "embedding" in m]
-        if not embeddings:
-            logger.error("❌ No valid embeddings found during rebuild.")
+    def _compact(self, doc_id: str) -> bool:
+        """Rebuild FAISS from the stored raw vectors without `doc_id`, renumbering ids from 0."""
+        if self.embeddings is None:
+            logger.error("❌ No stored vectors found during rebuild.")
             return False
 
-        dim = len(embeddings[0])
-        self.index = faiss.IndexFlatL2(dim)
-        self.index.add(np.vstack(embeddings))
+        remaining = [
+            (vid, meta) for vid, meta in self.metadata.items()
+            if meta.get("doc_id") != doc_id
+        ]
+        rows = np.array([vid for vid, _ in remaining], dtype="int64")
+        embs = np.ascontiguousarray(self.embeddings[rows], dtype="float32")
+        faiss.normalize_L2(embs)
+        self.index = self._index_from_vectors(embs, np.arange(len(embs), dtype="int64"))
 
-        new_meta = {}
-        for i, meta in enumerate(remaining):
-            new_meta[str(i)] = meta
+        self.embeddings = embs
+        self._emb_buf = None
+        self._emb_on_disk = False  # Renumbered rows are written by the next flush
+        _advise_hugepages(self.embeddings)
+        self.metadata = {i: meta for i, (_, meta) in enumerate(remaining)}
+        self._meta_rewrite = True  # Vector ids were renumbered
+        return True
 
-        self.metadata = new_meta
-        self.dim = dim
-        self._save_index()
-        self._persist_metadata()
 
-        logger.info(f"🗑️ Deleted doc_id={doc_id}. Rebuilt index with {self.index.ntotal} vectors.")
-        return True
+# ----------------------------
+# Process-wide instance
+# ----------------------------
+_instance: Optional[VectorService] = None
+_instance_lock = threading.Lock()
+
+
+def get_vector_service() -> VectorService:
+    """Return the shared VectorService, loading the FAISS index on first use."""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                _instance = VectorService()
+    return _instance
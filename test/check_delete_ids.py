@@ -0,0 +1,71 @@
+"""
+test/check_delete_ids.py
+
+Check that vector ids still point at the right rows after in-place deletes.
+For every index type this script:
+  1. Adds several synthetic documents to an in-memory VectorService.
+  2. Deletes one document from the middle.
+  3. Searches with stored vectors of the remaining documents and checks that
+     each top hit's row in `vs.embeddings` and its metadata match the query.
+
+Usage: PYTHONPATH=. python test/check_delete_ids.py
+"""
+
+import numpy as np
+import app.services.vector_service as vector_service_module
+from app.services.vector_service import VectorService
+
+INDEX_TYPES = ["flat", "hnsw", "sq_fp16", "sq_int8", "ivfpq", "auto"]
+IVF_INDEX_TYPES = {"ivfpq", "auto"}  # Need enough vectors to train IVF-PQ
+
+
+def check_delete_ids(index_type: str, num_docs: int = 5, chunks_per_doc: int = 0, dim: int = 32) -> bool:
+    """
+    Runs the add / delete / search round trip for one index type.
+
+    Args:
+        index_type (str): FAISS_INDEX_TYPE value to test
+        num_docs (int): Number of synthetic documents
+        chunks_per_doc (int): Vectors per document (0 = enough to train IVF-PQ where needed)
+        dim (int): Embedding dimension
+    Returns:
+        bool: True if every checked id resolved to its own vector and text.
+    """
+    # The index type is read from config at import time; switch it for this run only
+    vector_service_module.FAISS_INDEX_TYPE = index_type
+    if not chunks_per_doc:
+        chunks_per_doc = 10_000 if index_type in IVF_INDEX_TYPES else 1_000
+    rng = np.random.default_rng(0)
+    vs = VectorService(persist=False)
+
+    for d in range(num_docs):
+        embs = rng.standard_normal((chunks_per_doc, dim)).astype(np.float32)
+        vs.add_embeddings(embs, [f"{d}-{i}" for i in range(chunks_per_doc)], f"D{d}", "synthetic")
+
+    deleted = num_docs // 2
+    vs.delete_document(f"D{deleted}")
+
+    # Sample stored vectors from the documents before and after the deleted one
+    live_ids = np.array(sorted(vs.metadata), dtype="int64")
+    sample = rng.choice(live_ids, size=200, replace=False)
+    queries = np.ascontiguousarray(vs.embeddings[sample])
+    batch_results = vs.search_vectors(queries, top_k=1)
+
+    mismatches = 0
+    for vid, query, results in zip(sample.tolist(), queries, batch_results):
+        if not results:
+            mismatches += 1
+            continue
+        hit = results[0]
+        same_row = np.allclose(vs.embeddings[hit["vector_id"]], query, atol=1e-6)
+        if not same_row or hit["text"] != vs.metadata[vid]["text"]:
+            mismatches += 1
+
+    status = "✅" if mismatches == 0 else "❌"
+    print(f"{status} {index_type:8s} ({vs.factory}): {mismatches}/{len(sample)} ids resolved to the wrong row")
+    return mismatches == 0
+
+
+if __name__ == "__main__":
+    results = [check_delete_ids(index_type) for index_type in INDEX_TYPES]
+    raise SystemExit(0 if all(results) else 1)
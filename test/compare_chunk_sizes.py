@@ -6,23 +6,22 @@ This script:
   1. Reads a single document.
   2. Splits it using multiple (chunk_size, chunk_overlap) settings.
   3. Embeds each version using OpenAI embeddings.
-  4. Stores them in temporary FAISS indexes.
-  5. Runs a sample query against each index.
+  4. Stores them in one in-memory FAISS index, reset between configurations.
+  5. Runs a set of sample queries against each index in one batched search.
 """
 
-import os
-import tempfile
 from pathlib import Path
+import faiss
 import numpy as np
 from app.services.file_readers import read_file
 from app.services.docs_service import chunk_text, embed_chunks
 from app.services.vector_service import VectorService
 from app.core.config import OPENAI_API_KEY
-from app.services.embedding_service import get_single_embedding
+from app.services.embedding_service import get_embeddings
 
 def compare_chunk_configs(
     file_path: str,
-    query: str,
+    queries: list[str],
     chunk_sizes: list[int] = [500, 1000, 1500, 2000],
     chunk_overlap: int = 200,
     top_k: int = 3
@@ -32,63 +31,58 @@ def compare_chunk_configs(
 
     Args:
         file_path (str): Path to input document (.txt or .pdf)
-        query (str): Query text to test retrieval
+        queries (list[str]): Query texts to test retrieval
         chunk_sizes (list[int]): List of chunk sizes to evaluate
         chunk_overlap (int): Overlap size for all configurations
         top_k (int): Number of retrieved results per query
     """
     print(f"\n🔍 Comparing chunk configurations for: {Path(file_path).name}")
-    print(f"Query: {query}\n{'-' * 80}")
+    print(f"Queries: {queries}\n{'-' * 80}")
 
     # Read document once
     text = read_file(file_path)
 
+    # Embed all queries once, in one request (they do not depend on the chunk configuration)
+    query_embs = np.asarray(get_embeddings(queries), dtype=np.float32)
+    faiss.normalize_L2(query_embs)
+
+    # One in-memory index for all experiments (never loads or overwrites the app's persisted index)
+    vs = VectorService(persist=False)
+
     for size in chunk_sizes:
         print(f"\n🧩 Testing chunk_size={size}, overlap={chunk_overlap}...")
+        vs.reset()
+
+        # Step 1: Chunk text
+        chunks = chunk_text(text, chunk_size=size, chunk_overlap=chunk_overlap)
+        print(f"  • Generated {len(chunks)} chunks")
+
+        # Step 2: Embed chunks (one float32 matrix; metadata holds no vector copies)
+        embeddings = np.asarray(embed_chunks(chunks), dtype=np.float32)
+        dim = embeddings.shape[1]
+        print(f"  • Embedding dimension: {dim}")
+
+        # Step 3: Index the chunks
+        vs.add_embeddings(embeddings, chunks, f"exp_{size}", Path(file_path).name)
+
+        # Step 4: Test retrieval (all queries in one FAISS search)
+        batch_results = vs.search_vectors(query_embs, top_k=top_k)
 
-        # Create temporary folder for each experiment
-        with tempfile.TemporaryDirectory() as tmpdir:
-            os.environ["DATA_DIR"] = tmpdir  # isolate each FAISS index
-
-            # Step 1: Chunk text
-            chunks = chunk_text(text)
-            print(f"  • Generated {len(chunks)} chunks")
-
-            # Step 2: Embed chunks
-            embeddings = embed_chunks(chunks)
-            dim = len(embeddings[0])
-            print(f"  • Embedding dimension: {dim}")
-
-            # Step 3: Initialize FAISS
-            vs = VectorService()
-
-            metadatas = [
-                {
-                    "doc_id": f"exp_{size}",
-                    "source": Path(file_path).name,
-                    "chunk_id": i,
-                    "text": chunk,
-                    "embedding": emb
-                }
-                for i, (chunk, emb) in enumerate(zip(chunks, embeddings))
-            ]
-            vs.add_embeddings(embeddings, metadatas)
-
-            # Step 4: Test retrieval
-            results = vs.search(query, top_k=top_k)
-            print(f"  • Retrieved {len(results)} chunks")
-
-            # Step 5: Print top results
+        # Step 5: Print top results
+        distances = []
+        for query, results in zip(queries, batch_results):
+            print(f"  • {query!r}: retrieved {len(results)} chunks")
             for r in results:
                 snippet = r["text"][:100].replace("\n", " ")
                 print(f"    ↳ [Dist={r['distance']:.4f}] {snippet}...")
+            distances.extend(r["distance"] for r in results)
 
-            # Calculate average distance (lower = better)
-            if results:
-                avg_dist = np.mean([r["distance"] for r in results])
-                print(f"  • Avg distance: {avg_dist:.4f}")
-            else:
-                print("  ⚠️ No retrieval results for this configuration.")
+        # Calculate average distance (lower = better)
+        if distances:
+            avg_dist = np.mean(distances)
+            print(f"  • Avg distance: {avg_dist:.4f}")
+        else:
+            print("  ⚠️ No retrieval results for this configuration.")
 
     print("\n✅ Comparison complete.")
 
@@ -96,10 +90,13 @@ def compare_chunk_configs(
 if __name__ == "__main__":
     # Example usage
     test_file = "D:/Projects to do/Obulaneni_Bharadwaj_DataScience/My Resume.pdf"
-    test_query = "What is the educational background?"
+    test_queries = [
+        "What is the educational background?",
+        "What programming languages and tools are listed?",
+    ]
     compare_chunk_configs(
         file_path=test_file,
-        query=test_query,
+        queries=test_queries,
         chunk_sizes=[500, 1000, 1500],
         chunk_overlap=200,
         top_k=3